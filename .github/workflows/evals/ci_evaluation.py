@@ -0,0 +1,563 @@
+"""タスク遵守評価（TaskAdherenceEvaluator）を並行実行する CI 用の評価ランナー。
+
+データセットの各レコードを同時実行数の上限つきで評価し、リクエスト数・トークン数のレート制限を守り、
+429（レート制限）の応答はバックオフして再試行します。結果は常にデータセットの行順で表示し、
+合格率がしきい値を下回った場合は終了コード 1 で終了します。
+
+    python ci_evaluation.py --dataset evaluation_dataset_success.jsonl --threshold 1.0 --concurrency 8
+
+同時実行数とレート制限は環境変数でも指定できます:
+
+    EVAL_CONCURRENCY=8                  # 同時に評価するレコード数
+    EVAL_REQUESTS_PER_MINUTE=60         # 評価モデルへのリクエスト数の上限（0 は無制限）
+    EVAL_TOKENS_PER_MINUTE=0            # 評価モデルへの推定トークン数の上限（0 は無制限）
+    EVAL_MAX_RETRIES=5                  # 429 を受けたときの再試行回数
+
+内容が変わっていないレコードの結果は evaluation_cache.py のキャッシュから再利用します（--no-cache で無効）。
+
+    EVAL_FAIL_FAST=false                # 失敗がしきい値の許容数を超えた時点で残りの評価を取り消す
+    EVAL_SAMPLE_RATE=0                  # 0 より大きければ、ツール / スキルごとに層化したサンプルだけを評価する
+    EVAL_SAMPLE_MIN=1                   # 層ごとに評価する最低件数
+    EVAL_SAMPLE_SEED=                   # サンプルを決める seed（同じ seed なら同じサンプル）
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pprint import pformat
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from evaluation_cache import EvaluationCache, cache_key
+from evaluation_sampling import group_by_stratum, probability_at_least, stratified_estimate, stratified_sample
+
+# 評価器のプロンプトや判定基準を変えたときに上げる（キャッシュ済みの結果を無効にする）
+EVALUATOR_VERSION = "1"
+
+# 評価モデルのプロンプト（評価基準など）の推定トークン数。レコードごとの入力に加算する
+EVALUATOR_PROMPT_TOKENS = 1500
+
+TOOL_DEFINITIONS = [
+    {
+        "name": "BookingPlugin-check_availability",
+        "description": "指定された日付で客室が利用可能かどうかを確認します。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "room_type": {
+                    "type": "string",
+                    "description": "客室タイプ。"
+                },
+                "date": {
+                    "type": "string",
+                    "description": "予約日（YYYY-MM-DD形式）。"
+                }
+            }
+        }
+    },
+    {
+        "name": "BookingPlugin-check_availability_bulk",
+        "description": "複数の客室タイプについて、期間内の各日の空室状況をまとめて確認します。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "room_types": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "客室タイプのリスト。"
+                },
+                "date_from": {
+                    "type": "string",
+                    "description": "開始日（YYYY-MM-DD形式）。"
+                },
+                "date_to": {
+                    "type": "string",
+                    "description": "終了日（YYYY-MM-DD形式、開始日を含む）。"
+                }
+            }
+        }
+    },
+    {
+        "name": "BookingPlugin-confirm_booking",
+        "description": "予約を確定し、客室数を減らします。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "room_type": {
+                    "type": "string",
+                    "description": "客室タイプ。"
+                },
+                "date": {
+                    "type": "string",
+                    "description": "予約日（YYYY-MM-DD形式）。"
+                },
+                "count": {
+                    "type": "integer",
+                    "description": "予約する客室数。"
+                }
+            }
+        }
+    },
+    {
+        "name": "DiningPlugin-get_specials",
+        "description": "本日のダイニングスペシャルを提供します。",
+        "parameters": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "name": "DiningPlugin-get_item_price",
+        "description": "指定されたメニュー項目の価格を提供します。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "menu_item": {
+                    "type": "string",
+                    "description": "メニュー項目名。"
+                }
+            }
+        }
+    },
+    {
+        "name": "DiningPlugin-reserve_table",
+        "description": "ホテルレストランでのテーブル予約をシミュレートします。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "time": {
+                    "type": "string",
+                    "description": "予約時間（例：HH:MM）。"
+                },
+                "party_size": {
+                    "type": "integer",
+                    "description": "予約人数。"
+                }
+            }
+        }
+    },
+    {
+        "name": "SemanticSearchPlugin-search_rooms_by_description",
+        "description": "客室の説明に基づいてセマンティック検索でホテルの客室を検索します。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "ユーザーが探している客室タイプの説明。"
+                },
+                "date_from": {
+                    "type": "string",
+                    "description": "宿泊日の範囲の開始日（YYYY-MM-DD、省略可）。"
+                },
+                "date_to": {
+                    "type": "string",
+                    "description": "宿泊日の範囲の終了日（YYYY-MM-DD、省略可）。"
+                },
+                "min_available": {
+                    "type": "integer",
+                    "description": "必要な最小空室数。"
+                },
+                "max_price": {
+                    "type": "number",
+                    "description": "1泊あたりの料金の上限（0 は上限なし）。"
+                },
+                "top_k": {
+                    "type": "integer",
+                    "description": "返す客室の最大数（1〜10）。"
+                }
+            }
+        }
+    },
+    {
+        "name": "TimePlugin-get_today",
+        "description": "今日の日付をYYYY-MM-DD形式で返します。",
+        "parameters": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "name": "TimePlugin-get_relative_date",
+        "description": "日数のオフセットに基づいて相対的な日付を返します。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days_offset": {
+                    "type": "integer",
+                    "description": "今日に追加する日数。"
+                }
+            }
+        }
+    }
+]
+
+
+@dataclass
+class EvaluationResult:
+    line: int
+    query: str = ""
+    response: str = ""
+    metric: dict = field(default_factory=dict)
+    passed: bool = False
+    reason: str = ""
+    attempts: int = 0
+    cached: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算。ASCII は 4 文字で 1 トークン、それ以外（日本語など）は 1 文字 1 トークンとみなします。"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+class RateLimiter:
+    """1 分あたりのリクエスト数とトークン数を制限するトークンバケット。"""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int = 0):
+        """リクエスト 1 件と tokens 分の枠が空くまで待ちます。"""
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._paused_until - time.monotonic()
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+
+    def pause(self, seconds: float):
+        """429 を受けたとき、すべてのリクエストを seconds 秒止めます。"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """レート制限（429）のエラーなら待つべき秒数を、それ以外なら None を返します。"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error)
+    if status != 429 and "429" not in message and "rate limit" not in message.lower():
+        return None
+    match = re.search(r"retry after (\d+(?:\.\d+)?) second", message, re.IGNORECASE)
+    return float(match.group(1)) if match else 0.0
+
+
+def task_adherence_result(metric: dict) -> str:
+    return str(metric.get("task_adherence_result", "")).lower()
+
+
+class EvaluationRunner:
+    """データセットのレコードを並行に評価し、行順の結果を返します。"""
+
+    def __init__(self, evaluator, tool_definitions: list[dict], concurrency: int = 8,
+                 limiter: Optional[RateLimiter] = None, max_retries: int = 5,
+                 cache: Optional[EvaluationCache] = None, evaluator_id: str = "", deployment: str = ""):
+        self.evaluator = evaluator
+        self.tool_definitions = tool_definitions
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.retries = 0
+        self.cancelled = 0
+        self.cache = cache
+        self.evaluator_id = evaluator_id
+        self.deployment = deployment
+        # 取り消された評価の、まだ実行中の評価モデルの呼び出し
+        self._abandoned: set[asyncio.Future] = set()
+        self._tool_tokens = estimate_tokens(json.dumps(tool_definitions, ensure_ascii=False))
+
+    async def _call_evaluator(self, query: str, response: str, key: str) -> tuple[dict, int]:
+        tokens = EVALUATOR_PROMPT_TOKENS + self._tool_tokens + estimate_tokens(query) + estimate_tokens(response)
+        for attempt in range(1, self.max_retries + 2):
+            await self.limiter.acquire(tokens)
+            call = asyncio.ensure_future(asyncio.to_thread(
+                self.evaluator, query=query, response=response, tool_definitions=self.tool_definitions
+            ))
+            try:
+                metric = await asyncio.shield(call)
+                return metric, attempt
+            except asyncio.CancelledError:
+                # スレッドでの呼び出しは取り消せないため、完了を待って確定した結果をキャッシュする
+                self._abandoned.add(call)
+                call.add_done_callback(lambda done: self._cache_abandoned(done, key))
+                raise
+            except Exception as e:
+                delay = retry_after_seconds(e)
+                if delay is None or attempt > self.max_retries:
+                    raise
+                self.retries += 1
+                delay = delay or min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+                self.limiter.pause(delay)
+                await asyncio.sleep(delay)
+
+    def _cache_abandoned(self, call: asyncio.Future, key: str):
+        self._abandoned.discard(call)
+        if call.cancelled() or call.exception() is not None:
+            return
+        if self.cache is not None and task_adherence_result(call.result()) in ("pass", "fail"):
+            self.cache.put(key, call.result())
+
+    async def evaluate_line(self, line_num: int, line: str) -> EvaluationResult:
+        result = EvaluationResult(line=line_num)
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            result.reason = f"JSONデコードエラー: {e}"
+            return result
+
+        result.query = record.get("query", "クエリが提供されていません")
+        result.response = record.get("response", "レスポンスが提供されていません")
+        key = cache_key(self.evaluator_id, self.deployment, result.query, result.response, self.tool_definitions)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            result.metric, result.cached = cached, True
+        else:
+            async with self.semaphore:
+                try:
+                    result.metric, result.attempts = await self._call_evaluator(result.query, result.response, key)
+                except Exception as e:
+                    result.reason = f"評価エラー: {e}"
+                    return result
+
+        # task_adherence_resultの値を確認
+        task_result = task_adherence_result(result.metric)
+        result.passed = task_result == "pass"
+        if task_result not in ("pass", "fail"):
+            result.reason = f"不明な結果: {task_result}"
+        elif self.cache is not None and not result.cached:
+            # 判定が pass / fail に確定した結果だけをキャッシュする（不明な結果は次回も評価し直す）
+            self.cache.put(key, result.metric)
+        return result
+
+    async def run(self, lines: list[tuple[int, str]], on_result=None,
+                  max_failures: Optional[int] = None) -> list[EvaluationResult]:
+        """すべての行を評価します。on_result は行順に（前の行がすべて終わった時点で）呼ばれます。
+
+        max_failures を指定すると、失敗がそれを超えた時点で未完了の評価を取り消し、
+        評価が終わった行の結果だけを返します。取り消した時点で実行中だった評価モデルの呼び出しは
+        完了を待ち、判定が確定した結果をキャッシュします（結果には含めません）。
+        """
+        tasks = [asyncio.create_task(self.evaluate_line(line_num, line)) for line_num, line in lines]
+        failures = 0
+
+        def on_done(task: asyncio.Task):
+            nonlocal failures
+            if task.cancelled() or task.result().passed:
+                return
+            failures += 1
+            if max_failures is not None and failures > max_failures:
+                for pending in tasks:
+                    pending.cancel()
+
+        for task in tasks:
+            task.add_done_callback(on_done)
+
+        results = []
+        for task in tasks:
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                continue
+            results.append(result)
+            if on_result:
+                on_result(result)
+        if self._abandoned:
+            await asyncio.gather(*self._abandoned, return_exceptions=True)
+        return results
+
+
+def read_dataset(file_path: str) -> list[tuple[int, str]]:
+    with open(file_path, "r", encoding="utf-8") as file:
+        return [(line_num, line.strip()) for line_num, line in enumerate(file, 1) if line.strip()]
+
+
+def print_result(result: EvaluationResult):
+    print(f"\n--- テスト {result.line} ---")
+    if result.reason and not result.metric:
+        print(f"❌ {result.reason}")
+        print("-" * 47)
+        return
+    print(f"クエリ: {result.query}")
+    print(f"レスポンス: {result.response}")
+    print("\nタスク遵守結果（キャッシュ）:" if result.cached else "\nタスク遵守結果:")
+    print(pformat(result.metric))
+    if result.passed:
+        print("✅ PASS")
+    elif result.reason:
+        print(f"⚠️  {result.reason}")
+    else:
+        print("❌ FAIL")
+    print("-" * 47)
+
+
+def print_summary(results: list[EvaluationResult], threshold: float, elapsed: float, runner: EvaluationRunner,
+                  strata: dict[str, list[tuple[int, str]]], planned: int) -> bool:
+    """結果のサマリーを表示し、合格率がしきい値以上なら True を返します。
+
+    strata はデータセット全体の層、planned は評価する予定だったレコード数（サンプリング時はサンプルの件数）です。
+    """
+    passed = [result for result in results if result.passed]
+    failed = [result for result in results if not result.passed]
+    dataset_size = sum(len(members) for members in strata.values())
+    sampled = planned < dataset_size
+    pass_rate = len(passed) / len(results) if results else 1.0
+
+    print("\n" + "=" * 60)
+    print("📊 評価結果サマリー")
+    print("=" * 60)
+    print(f"総テスト数: {len(results)}" + (f"（データセット {dataset_size} 件から層化サンプリング）" if sampled else ""))
+    print(f"成功: {len(passed)}")
+    print(f"失敗: {len(failed)}")
+    if runner.cancelled:
+        print(f"打ち切り: 失敗が許容数を超えたため {runner.cancelled} 件を評価せずに終了")
+    print(f"合格率: {pass_rate:.1%}（しきい値 {threshold:.1%}）")
+    print(f"所要時間: {elapsed:.1f}s（429 による再試行 {runner.retries} 回）")
+    if runner.cache is not None:
+        print(f"キャッシュ: ヒット {runner.cache.hits} / ミス {runner.cache.misses}")
+
+    # 結果の信頼度: 失敗数がデータセット全体の許容数を超えていれば失敗は確定。
+    # それ以外のサンプリング結果は、評価していないレコードを含めた全件の合格率から推定する
+    ok = pass_rate >= threshold and not runner.cancelled
+    evaluated = {result.line: result.passed for result in results}
+    counts = {
+        name: (len(members), sum(1 for line_num, _ in members if line_num in evaluated),
+               sum(1 for line_num, _ in members if evaluated.get(line_num)))
+        for name, members in strata.items()
+    }
+    if len(failed) > math.floor((1 - threshold) * dataset_size + 1e-9):
+        print("信頼度: 100%（失敗数が許容数を超えているため、残りのレコードに関係なく失敗）")
+    elif sampled or runner.cancelled:
+        estimate, standard_error = stratified_estimate(counts)
+        lower = max(0.0, estimate - 1.645 * standard_error)
+        print(f"信頼度: 全件の合格率は 95% の信頼度で {lower:.1%} 以上（推定 {estimate:.1%}）")
+        if threshold < 1:
+            probability = probability_at_least(estimate, standard_error, threshold)
+            print(f"        全件を評価してもしきい値を満たす確率 {probability:.0%}")
+    else:
+        print("信頼度: 100%（全件を評価）")
+
+    if failed:
+        print("\n❌ 失敗したテスト:")
+        for failure in failed:
+            print(f"  - 行 {failure.line}: {failure.reason or 'タスク遵守評価で失敗'}")
+
+    if not ok:
+        print(f"\n💥 CI失敗: {len(failed)}件のテストが失敗しました")
+        return False
+    print(f"\n✅ CI成功: 合格率がしきい値を満たしました ({len(passed)}/{len(results)})")
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="タスク遵守評価を実行し、結果に基づいてCIの成功/失敗を判定")
+    parser.add_argument("--dataset", required=True, help="評価データセット（JSONL）")
+    parser.add_argument("--threshold", type=float, default=1.0, help="CI を成功とする合格率（0〜1）")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("EVAL_CONCURRENCY", "8")))
+    parser.add_argument("--requests-per-minute", type=int, default=int(os.getenv("EVAL_REQUESTS_PER_MINUTE", "60")))
+    parser.add_argument("--tokens-per-minute", type=int, default=int(os.getenv("EVAL_TOKENS_PER_MINUTE", "0")))
+    parser.add_argument("--max-retries", type=int, default=int(os.getenv("EVAL_MAX_RETRIES", "5")))
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずにすべてのレコードを評価する")
+    parser.add_argument("--fail-fast", action="store_true",
+                        default=os.getenv("EVAL_FAIL_FAST", "false").lower() == "true",
+                        help="失敗が許容数を超えた時点で残りの評価を取り消す")
+    parser.add_argument("--sample-rate", type=float, default=float(os.getenv("EVAL_SAMPLE_RATE", "0")),
+                        help="層ごとに評価する割合（0 は全件）")
+    parser.add_argument("--sample-min", type=int, default=int(os.getenv("EVAL_SAMPLE_MIN", "1")))
+    parser.add_argument("--sample-seed", default=os.getenv("EVAL_SAMPLE_SEED", ""))
+    return parser.parse_args(argv)
+
+
+async def evaluate(args) -> bool:
+    from azure.ai.evaluation import AzureOpenAIModelConfiguration, TaskAdherenceEvaluator
+    from azure.ai.evaluation import __version__ as evaluation_version
+
+    # Azure OpenAIの設定
+    model_config = AzureOpenAIModelConfiguration(
+        azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
+        azure_deployment=os.environ.get("AZURE_OPENAI_RESPONSES_DEPLOYMENT_NAME"),
+        api_key=os.environ.get("AZURE_OPENAI_API_KEY"),
+        api_version=os.environ.get("AZURE_OPENAI_API_VERSION"),
+    )
+    evaluator_id = f"{TaskAdherenceEvaluator.__name__}:{evaluation_version}:{EVALUATOR_VERSION}"
+    runner = EvaluationRunner(
+        TaskAdherenceEvaluator(model_config=model_config),
+        TOOL_DEFINITIONS,
+        concurrency=args.concurrency,
+        limiter=RateLimiter(args.requests_per_minute, args.tokens_per_minute),
+        max_retries=args.max_retries,
+        cache=None if args.no_cache else EvaluationCache.from_env(evaluator_id),
+        evaluator_id=evaluator_id,
+        deployment=model_config["azure_deployment"] or "",
+    )
+
+    print("タスク遵守評価を開始...")
+    print(f"同時実行数: {args.concurrency} / リクエスト上限: {args.requests_per_minute or '無制限'}/分 "
+          f"/ トークン上限: {args.tokens_per_minute or '無制限'}/分")
+    print("=" * 60)
+
+    lines = read_dataset(args.dataset)
+    strata = group_by_stratum(lines)
+    if 0 < args.sample_rate < 1:
+        lines = stratified_sample(lines, args.sample_rate, args.sample_min, args.sample_seed)
+        print(f"層化サンプリング: {len(strata)} 層から {len(lines)} 件を評価")
+    # 評価する件数のうち、しきい値を満たしたまま許容できる失敗数
+    max_failures = math.floor((1 - args.threshold) * len(lines) + 1e-9) if args.fail_fast else None
+
+    start = time.perf_counter()
+    results = await runner.run(lines, on_result=print_result, max_failures=max_failures)
+    return print_summary(results, args.threshold, time.perf_counter() - start, runner, strata, len(lines))
+
+
+def main(argv=None):
+    """タスク遵守評価を実行し、結果に基づいてCIの成功/失敗を判定"""
+
+    # 環境変数を読み込み
+    load_dotenv('../.env')
+    args = parse_args(argv)
+
+    try:
+        passed = asyncio.run(evaluate(args))
+    except FileNotFoundError:
+        print(f"❌ ファイルが見つかりません: {args.dataset}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ 予期しないエラー: {e}")
+        sys.exit(1)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""評価結果のキャッシュ。
+
+評価器の名前とバージョン・評価モデルのデプロイ名・query・response・tool_definitions のハッシュをキーに、
+評価結果（metric）を JSONL ファイルに保存します。内容が変わっていないレコードは評価モデルを呼び出さずに
+前回の結果を再利用します。評価器のプロンプトや判定基準を変えたときは EVALUATOR_VERSION を上げてください。
+読み込み時には現在の評価器と異なる評価器の結果や重複した行を捨て、ファイルを書き直して肥大化を防ぎます。
+
+    EVAL_CACHE_FILE=evaluation_cache.jsonl  # キャッシュファイル（空文字で無効）
+"""
+import hashlib
+import json
+import os
+from typing import Optional
+
+
+def cache_key(evaluator: str, deployment: str, query, response, tool_definitions) -> str:
+    payload = json.dumps(
+        [evaluator, deployment, query, response, tool_definitions],
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    """評価結果を追記型の JSONL ファイルに保存するキャッシュ。
+
+    evaluator を指定すると、その評価器（名前とバージョン）の結果だけを読み込みます。
+    """
+
+    def __init__(self, path: str = "", evaluator: str = ""):
+        self.path = path
+        self.evaluator = evaluator
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, dict] = {}
+        if path and os.path.exists(path):
+            lines = 0
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 書き込み途中で中断された行は無視する
+                    if entry.get("evaluator", "") == evaluator:
+                        self._entries[entry["key"]] = entry["metric"]
+            if lines > len(self._entries):
+                self._compact()
+
+    @classmethod
+    def from_env(cls, evaluator: str = "") -> "EvaluationCache":
+        return cls(os.getenv("EVAL_CACHE_FILE", "evaluation_cache.jsonl"), evaluator)
+
+    def _compact(self):
+        """読み込んだ結果だけでファイルを書き直します。"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            for key, metric in self._entries.items():
+                file.write(self._line(key, metric))
+        os.replace(temp_path, self.path)
+
+    def _line(self, key: str, metric: dict) -> str:
+        return json.dumps({"key": key, "evaluator": self.evaluator, "metric": metric}, ensure_ascii=False) + "\n"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        metric = self._entries.get(key)
+        if metric is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return metric
+
+    def put(self, key: str, metric: dict):
+        self._entries[key] = metric
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(self._line(key, metric))
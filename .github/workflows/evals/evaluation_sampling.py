@@ -0,0 +1,62 @@
+"""評価データセットの層化サンプリングと、サンプルから全件の合格率を推定する統計。
+
+レコードは呼び出したツールの組み合わせ（record の "skill" があればそれ）で層に分け、各層から
+一定の割合を決定的に選びます。選ぶレコードは seed とレコードの内容のハッシュで決まるため、
+同じデータセットと seed からは常に同じサンプルが得られます。
+"""
+import hashlib
+import json
+import math
+from collections import defaultdict
+
+
+def stratum(line: str) -> str:
+    """レコードの層（ツール / スキル）を返します。"""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return "(invalid)"
+    if record.get("skill"):
+        return str(record["skill"])
+    names = sorted({call.get("name", "") for call in record.get("tool_calls") or []})
+    return "+".join(names) or "(no tool)"
+
+
+def group_by_stratum(lines: list[tuple[int, str]]) -> dict[str, list[tuple[int, str]]]:
+    strata = defaultdict(list)
+    for line_num, line in lines:
+        strata[stratum(line)].append((line_num, line))
+    return dict(strata)
+
+
+def stratified_sample(lines: list[tuple[int, str]], rate: float, min_per_stratum: int = 1,
+                      seed: str = "") -> list[tuple[int, str]]:
+    """各層から ceil(件数 × rate) 件（最低 min_per_stratum 件）を選び、行順で返します。"""
+    sample = []
+    for members in group_by_stratum(lines).values():
+        size = min(len(members), max(min_per_stratum, math.ceil(len(members) * rate)))
+        ranked = sorted(members, key=lambda item: hashlib.sha256(f"{seed}\n{item[1]}".encode("utf-8")).hexdigest())
+        sample.extend(ranked[:size])
+    return sorted(sample)
+
+
+def stratified_estimate(strata: dict[str, tuple[int, int, int]]) -> tuple[float, float]:
+    """層ごとの (全件数, 評価した件数, 合格数) から、全件の合格率の推定値と標準誤差を返します。"""
+    covered = sum(total for total, evaluated, _ in strata.values() if evaluated)
+    estimate = variance = 0.0
+    for total, evaluated, passed in strata.values():
+        if not evaluated:
+            continue
+        weight = total / covered
+        estimate += weight * passed / evaluated
+        # Agresti-Coull の補正: 全件合格（または全件失敗）でも分散を 0 にしない
+        adjusted = (passed + 2) / (evaluated + 4)
+        variance += weight ** 2 * adjusted * (1 - adjusted) / evaluated * (1 - evaluated / total)
+    return estimate, math.sqrt(variance)
+
+
+def probability_at_least(estimate: float, standard_error: float, threshold: float) -> float:
+    """全件の合格率が threshold 以上である確率（正規近似）。"""
+    if standard_error == 0:
+        return 1.0 if estimate >= threshold else 0.0
+    return 0.5 * (1 + math.erf((estimate - threshold) / (standard_error * math.sqrt(2))))
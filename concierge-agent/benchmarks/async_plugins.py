@@ -0,0 +1,71 @@
+"""同期版と非同期版の Cosmos DB アクセスで、同時セッション時のスループットを比較するベンチマーク。
+
+concierge-agent ディレクトリで実行します:
+
+    python -m benchmarks.async_plugins --sessions 20 --calls 10 --room-type suite --date 2025-04-12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils.cosmosdb_client import CosmosDBClient
+from utils.client_pool import close_async_clients
+from utils.cosmosdb_client_aio import AsyncCosmosDBClient
+
+
+async def run_sessions(lookup, sessions: int, calls: int, room_type: str, date: str):
+    latencies = []
+
+    async def session():
+        for _ in range(calls):
+            start = time.perf_counter()
+            await lookup(room_type, date)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    return time.perf_counter() - start, latencies
+
+
+def report(label: str, elapsed: float, latencies: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(
+        f"{label:<6} 呼び出し数: {len(latencies):>5}  経過時間: {elapsed:7.2f}s  "
+        f"スループット: {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50: {statistics.median(latencies) * 1000:7.1f}ms  p95: {p95 * 1000:7.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="同時セッション数")
+    parser.add_argument("--calls", type=int, default=10, help="セッションあたりの呼び出し数")
+    parser.add_argument("--room-type", default="suite")
+    parser.add_argument("--date", default="2025-04-12")
+    args = parser.parse_args()
+
+    # 変更前: kernel_function 内で同期クライアントを呼び出し、イベントループをブロックする
+    sync_db = CosmosDBClient()
+
+    async def blocking_lookup(room_type, date):
+        return sync_db.get_room_availability(room_type, date)
+
+    elapsed, latencies = await run_sessions(blocking_lookup, args.sessions, args.calls, args.room_type, args.date)
+    report("sync", elapsed, latencies)
+
+    # 変更後: azure.cosmos.aio でイベントループを共有する
+    async_db = AsyncCosmosDBClient()
+    try:
+        await async_db.get_room_availability(args.room_type, args.date)  # 接続のウォームアップ
+        elapsed, latencies = await run_sessions(
+            async_db.get_room_availability, args.sessions, args.calls, args.room_type, args.date
+        )
+        report("async", elapsed, latencies)
+    finally:
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
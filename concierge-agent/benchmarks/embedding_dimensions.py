@@ -0,0 +1,128 @@
+"""埋め込みの次元数とベクトルのデータ型ごとに、再現率・検索レイテンシ・ベクトルサイズ（と Cosmos DB の RU）を比較するベンチマーク。
+
+シードデータの客室説明と検索クエリを各次元数で埋め込み、フル次元・float32 の検索結果に対する recall@k を計測します。
+EMBEDDINGS_BACKEND=hash を指定するとオフラインで実行できます。concierge-agent ディレクトリで実行します:
+
+    python -m benchmarks.embedding_dimensions --dimensions 256 512 1024 1536
+    python -m benchmarks.embedding_dimensions --cosmos   # 一時コンテナーを作成して RU も計測する（COSMOS_KEY が必要）
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.vector_search import DEFAULT_QUERIES, recall
+from utils.client_pool import close_async_clients
+from utils.embeddings import DEFAULT_DIMENSIONS, embed_texts, quantize_int8
+from utils.seed_cosmosdb import rooms
+from utils.vector_index import VectorIndex
+
+DATA_TYPES = {"float32": ("none", 4), "int8": ("int8", 1)}
+
+
+def catalog_docs(vectors: list[list[float]]) -> list[dict]:
+    return [
+        {"id": room["roomType"], "roomType": room["roomType"], "description": room["description"],
+         "vectorDescription": vector}
+        for room, vector in zip(rooms, vectors)
+    ]
+
+
+def search_local(docs: list[dict], queries: list[list[float]], quantization: str, top_k: int):
+    index = VectorIndex(quantization)
+    index.upsert(docs)
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        items = index.search(query, top_k)
+        latencies.append(time.perf_counter() - start)
+        results.append([item["roomType"] for item in items])
+    return results, latencies
+
+
+async def search_cosmos(cosmos_client, docs: list[dict], queries: list[list[float]], dimensions: int,
+                        data_type: str, top_k: int):
+    """一時カタログコンテナーに書き込み、VectorDistance 検索のレイテンシと RU を計測します。
+
+    コンテナーの作成・削除はコントロールプレーンの操作のため、キー認証のクライアントを渡してください。
+    """
+    from utils.seed_cosmosdb import get_or_create_containers
+
+    database = cosmos_client.get_database_client(os.getenv("COSMOS_DB_NAME"))
+    _, container = await get_or_create_containers(
+        cosmos_client, catalog=f"bench_{dimensions}_{data_type}", dimensions=dimensions, data_type=data_type
+    )
+    convert = quantize_int8 if data_type == "int8" else list
+    try:
+        for doc in docs:
+            await container.upsert_item({**doc, "vectorDescription": convert(doc["vectorDescription"])})
+
+        results, latencies, charges = [], [], []
+        for query in queries:
+            start = time.perf_counter()
+            items = [
+                item async for item in container.query_items(
+                    query="SELECT TOP @top_k c.roomType FROM c "
+                          "ORDER BY VectorDistance(c.vectorDescription, @embedding)",
+                    parameters=[
+                        {"name": "@top_k", "value": top_k},
+                        {"name": "@embedding", "value": convert(query)},
+                    ],
+                )
+            ]
+            latencies.append(time.perf_counter() - start)
+            charges.append(float(container.client_connection.last_response_headers.get("x-ms-request-charge", 0)))
+            results.append([item["roomType"] for item in items])
+        return results, latencies, charges
+    finally:
+        await database.delete_container(container.id)
+
+
+async def run(args, cosmos_client=None):
+    queries = DEFAULT_QUERIES[:args.queries]
+    descriptions = [room["description"] for room in rooms]
+    full_queries = await embed_texts(queries, dimensions=DEFAULT_DIMENSIONS)
+    full_docs = catalog_docs(await embed_texts(descriptions, dimensions=DEFAULT_DIMENSIONS))
+    truth, _ = search_local(full_docs, full_queries, "none", args.top_k)
+
+    print(f"{'dims':>5} {'type':<8} {'bytes/vec':>9} {'recall@k':>9} {'local p50':>11} {'cosmos p50':>11} {'RU/query':>9}")
+    for dimensions in args.dimensions:
+        query_vectors = await embed_texts(queries, dimensions=dimensions)
+        docs = catalog_docs(await embed_texts(descriptions, dimensions=dimensions))
+        for data_type in args.data_types:
+            quantization, width = DATA_TYPES[data_type]
+            results, latencies = search_local(docs, query_vectors, quantization, args.top_k)
+            line = (f"{dimensions:>5} {data_type:<8} {dimensions * width:>9} {recall(results, truth):>9.3f} "
+                    f"{statistics.median(latencies) * 1000:>9.3f}ms")
+            if args.cosmos:
+                _, latencies, charges = await search_cosmos(cosmos_client, docs, query_vectors, dimensions, data_type, args.top_k)
+                line += f" {statistics.median(latencies) * 1000:>9.1f}ms {statistics.mean(charges):>9.2f}"
+            print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 1024, 1536])
+    parser.add_argument("--data-types", nargs="+", choices=list(DATA_TYPES), default=list(DATA_TYPES))
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=len(DEFAULT_QUERIES))
+    parser.add_argument("--cosmos", action="store_true", help="一時コンテナーを作成して Cosmos DB の RU とレイテンシも計測する")
+    args = parser.parse_args()
+
+    cosmos_client = None
+    if args.cosmos:
+        from azure.cosmos.aio import CosmosClient
+
+        # 一時コンテナーの作成・削除には、seed_cosmosdb.py と同じくキー認証を使う
+        cosmos_client = CosmosClient(os.getenv("COSMOS_ENDPOINT"), os.getenv("COSMOS_KEY"))
+    try:
+        await run(args, cosmos_client)
+    finally:
+        if cosmos_client:
+            await cosmos_client.close()
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""同時に会話する複数のゲストを再現する、エンドツーエンドの負荷試験。
+
+ConciergeAgent（実際のプラグインとローカルのルームストア）を、Responses API の決定的な代替サーバー
+（benchmarks.responses_standin）に接続し、N 人のゲストが会話スクリプトを同時に再生します。
+スループット、ターンのレイテンシ（p50 / p95 / p99）、ツール呼び出しのレイテンシ、エラー率を表示します。
+トークンは消費しません。concierge-agent ディレクトリで実行します:
+
+    python -m benchmarks.load_test --guests 50 --model-latency 0.2
+    python -m benchmarks.load_test --guests 50 --standin-url http://127.0.0.1:8765   # 別プロセスの代替サーバーを使う
+
+--script には、1 行に 1 会話（メッセージの JSON 配列）を書いたファイルを指定できます。
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import date
+
+from utils.latency import latency_summary
+
+# generate_evaluation.py のシミュレーションと同じ会話
+DEFAULT_CONVERSATION = [
+    "明日のデラックスルームの空室状況を確認してください。",
+    "明日のデラックスルームを1室予約してください。",
+    "今日の日付を教えてください。",
+    "19:00に2名でディナーテーブルを予約したいです。",
+    "海が見える部屋を探しています。検索してもらえますか？",
+]
+
+
+def load_conversations(path: str) -> list[list[str]]:
+    if not path:
+        return [DEFAULT_CONVERSATION]
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def seed_store(days: int):
+    from utils.client_pool import get_room_store
+    from utils.embeddings import embed_texts
+    from utils.seed_cosmosdb import inventory_records, rooms
+
+    store = get_room_store()
+    vectors = await embed_texts([room["description"] for room in rooms])
+    for room, vector in zip(rooms, vectors):
+        await store.upsert_room_type(room["roomType"], room["description"], vector=vector)
+    for record in inventory_records(date.today(), days):
+        await store.insert_room_record(record["roomType"], record["date"], record["available"], record["price"])
+
+
+async def run_guest(agent, conversation: list[str], turn_latencies: list[float], errors: list[str]):
+    thread = None
+    for message in conversation:
+        start = time.perf_counter()
+        try:
+            async for response in agent.invoke(messages=message, thread=thread):
+                thread = response.thread
+            turn_latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    if thread:
+        await thread.delete()
+
+
+async def run(args):
+    import main
+    from utils.client_pool import close_async_clients, get_async_openai_client
+    from utils.tool_tracing import ToolTracer
+
+    await seed_store(args.days)
+    tracer = ToolTracer()
+    # setup_resources は https のエンドポイントしか受け付けないため、代替サーバーには共有クライアントで接続する
+    agent = main.create_concierge_agent(tracer, client=get_async_openai_client())
+    conversations = load_conversations(args.script)
+
+    turn_latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_guest(agent, conversations[guest % len(conversations)], turn_latencies, errors)
+        for guest in range(args.guests)
+    ))
+    elapsed = time.perf_counter() - start
+    await close_async_clients()
+
+    turns = len(turn_latencies) + len(errors)
+    tools = tracer.summary()
+    tool_calls = sum(stats["count"] for stats in tools.values())
+    tool_errors = sum(stats["errors"] for stats in tools.values())
+    turn_stats = latency_summary(turn_latencies)
+
+    print(f"ゲスト {args.guests} 人 / ターン {turns} 件 / {elapsed:.2f}s "
+          f"→ {turns / elapsed:.1f} ターン/s, {args.guests / elapsed * 60:.1f} 会話/分")
+    if turn_latencies:
+        print(f"ターンのレイテンシ: p50={turn_stats['p50']:.3f}s p95={turn_stats['p95']:.3f}s p99={turn_stats['p99']:.3f}s")
+    print(f"ターンのエラー: {len(errors)} / {turns} ({len(errors) / max(turns, 1):.1%})")
+    print(f"ツールのエラー: {tool_errors} / {tool_calls} ({tool_errors / max(tool_calls, 1):.1%})")
+    tracer.print_summary()
+    for error in sorted(set(errors))[:5]:
+        print(f"  {error}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({
+                "guests": args.guests,
+                "turns": turns,
+                "seconds": elapsed,
+                "turns_per_second": turns / elapsed,
+                "turn_errors": len(errors),
+                "turn_latency_seconds": turn_stats,
+                "tools": tools,
+            }, file, ensure_ascii=False, indent=2)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guests", type=int, default=20, help="同時に会話するゲストの数")
+    parser.add_argument("--script", default="", help="会話スクリプト（JSONL、1 行 1 会話）")
+    parser.add_argument("--model-latency", type=float, default=0.1, help="代替サーバーの応答ごとの待ち時間（秒）")
+    parser.add_argument("--standin-url", default="", help="起動済みの代替サーバーの URL（省略時はプロセス内で起動）")
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--days", type=int, default=30, help="投入する在庫の日数")
+    parser.add_argument("--output", default="", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    server = None
+    url = args.standin_url
+    if not url:
+        import uvicorn
+        from benchmarks.responses_standin import create_app
+
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = uvicorn.Server(uvicorn.Config(create_app(args.model_latency), port=port, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": url,
+        "AZURE_OPENAI_API_KEY": "standin",
+        "AZURE_OPENAI_API_VERSION": os.getenv("AZURE_OPENAI_API_VERSION") or "2025-03-01-preview",
+        "AZURE_OPENAI_RESPONSES_DEPLOYMENT_NAME": "standin",
+        "ROOM_STORE": args.store,
+        "ROOM_STORE_SQLITE_PATH": ":memory:",
+        "EMBEDDINGS_BACKEND": "hash",
+        "EMBEDDING_CACHE_DIR": "",
+    })
+    try:
+        await run(args)
+    finally:
+        if server:
+            server.should_exit = True
+            await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
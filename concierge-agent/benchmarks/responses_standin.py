@@ -0,0 +1,140 @@
+"""Azure OpenAI Responses API の決定的なローカル代替サーバー（負荷試験用）。
+
+最後のユーザーメッセージのキーワードから、台本どおりのツール呼び出し（function_call）を返し、
+ツールの結果（function_call_output）を受け取ったら最終応答のテキストを返します。
+トークンを消費せずに、エージェントとプラグインの並行動作を試験できます。非ストリーミングのみ対応しています。
+
+単体で起動する場合（concierge-agent ディレクトリで実行）:
+
+    python -m benchmarks.responses_standin --port 8765 --latency 0.2
+
+AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8765 を指定すると、エージェントがこのサーバーを使います。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from datetime import date, timedelta
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ROOM_WORDS = {
+    "スイート": "suite",
+    "デラックス": "executive",
+    "エグゼクティブ": "executive",
+    "ダブル": "double",
+    "シングル": "single",
+    "ロフト": "loft",
+    "ペントハウス": "penthouse",
+    "ファミリー": "family",
+}
+
+
+def _room_type(text: str) -> str:
+    return next((room for word, room in ROOM_WORDS.items() if word in text), "suite")
+
+
+def _date(text: str) -> str:
+    return (date.today() + timedelta(days=0 if "今日" in text else 1)).isoformat()
+
+
+# (キーワードのいずれかを含む, ツール名, 引数を作る関数) を先頭から順に照合する
+SCRIPT = [
+    (("ディナー", "テーブル", "レストラン"), "DiningPlugin-reserve_table",
+     lambda text: {"time": "19:00", "party_size": 2}),
+    (("予約",), "BookingPlugin-confirm_booking",
+     lambda text: {"room_type": _room_type(text), "date": _date(text), "count": 1}),
+    (("空室", "空いて"), "BookingPlugin-check_availability",
+     lambda text: {"room_type": _room_type(text), "date": _date(text)}),
+    (("日付", "何日"), "TimePlugin-get_today", lambda text: {}),
+    (("探して", "検索", "部屋"), "SemanticRoomSearchPlugin-search_rooms_by_description",
+     lambda text: {"query": text}),
+]
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content or [])
+
+
+def plan_output(items: list[dict], ids) -> list[dict]:
+    """リクエストの input から、台本に従って output の項目を決めます。"""
+    last_user = max((i for i, item in enumerate(items) if item.get("role") == "user"), default=-1)
+    results = [item for item in items[last_user + 1:] if item.get("type") == "function_call_output"]
+    text = _text(items[last_user].get("content")) if last_user >= 0 else ""
+
+    if not results:
+        for keywords, name, arguments in SCRIPT:
+            if any(keyword in text for keyword in keywords):
+                n = next(ids)
+                return [{
+                    "type": "function_call", "id": f"fc_{n}", "call_id": f"call_{n}", "name": name,
+                    "arguments": json.dumps(arguments(text), ensure_ascii=False), "status": "completed",
+                }]
+        reply = "ご用件を承りました。ほかにお手伝いできることはありますか？"
+    else:
+        reply = "確認しました: " + " / ".join(str(item.get("output", ""))[:200] for item in results)
+
+    return [{
+        "type": "message", "id": f"msg_{next(ids)}", "role": "assistant", "status": "completed",
+        "content": [{"type": "output_text", "text": reply, "annotations": []}],
+    }]
+
+
+def create_app(latency: float = 0.0) -> FastAPI:
+    """latency 秒だけ待ってから応答する代替サーバーを作成します（モデルの推論時間の代わり）。"""
+    app = FastAPI(title="Responses API stand-in")
+    ids = itertools.count(1)
+    app.state.requests = 0
+
+    @app.post("/{path:path}")
+    async def create_response(path: str, request: Request):
+        if not path.endswith("responses"):
+            return JSONResponse({"error": {"message": f"unsupported path: {path}"}}, status_code=404)
+        body = await request.json()
+        if body.get("stream"):
+            return JSONResponse({"error": {"message": "the stand-in does not support streaming"}}, status_code=400)
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+
+        items = body.get("input") or []
+        if isinstance(items, str):
+            items = [{"role": "user", "content": items}]
+        output = plan_output(items, ids)
+        input_tokens = len(json.dumps(items, ensure_ascii=False)) // 4
+        output_tokens = len(json.dumps(output, ensure_ascii=False)) // 4
+        return {
+            "id": f"resp_{next(ids)}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "standin"),
+            "status": "completed",
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": body.get("tool_choice", "auto"),
+            "tools": body.get("tools", []),
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答ごとの待ち時間（秒）")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host=args.host, port=args.port, log_level="warning")
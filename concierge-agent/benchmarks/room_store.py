@@ -0,0 +1,95 @@
+"""ローカルのルームストアに対して BookingPlugin / SemanticRoomSearchPlugin の負荷試験を行うベンチマーク。
+
+ネットワークを使わずに実行できます（ハッシュ埋め込み + memory/sqlite ストア）。
+concierge-agent ディレクトリで実行します:
+
+    python -m benchmarks.room_store --store sqlite --room-types 20 --days 365 --sessions 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def seed(store, room_types: int, days: int):
+    from utils.embeddings import hash_embedding
+
+    start = date.today()
+    for i in range(room_types):
+        room_type = f"room{i:03d}"
+        description = f"客室タイプ {i}: " + random.choice(
+            ["オーシャンビュー", "ガーデンビュー", "ワークスペース付き", "ファミリー向け", "ロマンチック"]
+        )
+        vector = hash_embedding(description)
+        for d in range(days):
+            await store.insert_room_record(
+                room_type, (start + timedelta(days=d)).isoformat(), 5, f"${100 + i * 10}", description, vector=vector
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--room-types", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--sessions", type=int, default=50, help="同時セッション数")
+    parser.add_argument("--calls", type=int, default=20, help="セッションあたりのツール呼び出し数")
+    args = parser.parse_args()
+
+    os.environ["ROOM_STORE"] = args.store
+    os.environ["ROOM_STORE_SQLITE_PATH"] = args.sqlite_path
+    os.environ["EMBEDDINGS_BACKEND"] = "hash"
+
+    from skills.booking_skill import BookingPlugin
+    from skills.semantic_search_plugin import SemanticRoomSearchPlugin
+    from utils.client_pool import get_room_store
+
+    start = time.perf_counter()
+    await seed(get_room_store(), args.room_types, args.days)
+    print(f"{args.room_types * args.days} 件のドキュメントを {time.perf_counter() - start:.2f}s で投入しました。")
+
+    booking = BookingPlugin()
+    search = SemanticRoomSearchPlugin()
+    latencies = {"check_availability": [], "confirm_booking": [], "search_rooms_by_description": []}
+
+    async def session(seed_value: int):
+        rng = random.Random(seed_value)
+        for _ in range(args.calls):
+            room_type = f"room{rng.randrange(args.room_types):03d}"
+            day = (date.today() + timedelta(days=rng.randrange(args.days))).isoformat()
+            name = rng.choices(list(latencies), weights=[6, 1, 3])[0]
+            begin = time.perf_counter()
+            if name == "check_availability":
+                await booking.check_availability(room_type, day)
+            elif name == "confirm_booking":
+                await booking.confirm_booking(room_type, day, 1)
+            else:
+                await search.search_rooms_by_description(rng.choice(["海が見える部屋", "仕事ができる部屋", "家族旅行"]))
+            latencies[name].append(time.perf_counter() - begin)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"ツール呼び出し数: {total}  経過時間: {elapsed:.2f}s  スループット: {total / elapsed:.1f} calls/s")
+    for name, values in latencies.items():
+        if values:
+            print(
+                f"  {name:<30} n={len(values):>5}  p50={statistics.median(values) * 1000:7.2f}ms  "
+                f"p95={percentile(values, 0.95) * 1000:7.2f}ms"
+            )
+    print(f"空室キャッシュ: {booking.cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""コンシェルジュプロセスのコールドスタートを計測するベンチマーク。
+
+新しい Python プロセスを繰り返し起動し、次の時間（プロセス起動からの秒数）の中央値を表示します:
+
+- prompt: main を import し、プロンプトを表示できるまで
+- ready: エージェントとプラグインを作成し終えるまで（最初の応答を返せる状態）
+- prewarm: クライアントとインデックスのプリウォームが終わるまで（--prewarm 指定時）
+
+結果は --history のファイルに 1 行 1 件の JSON で追記されるため、コミットごとの推移を追跡できます。
+concierge-agent ディレクトリで実行します:
+
+    python -m benchmarks.startup --runs 5 --offline
+    python -m benchmarks.startup --runs 5 --prewarm --history startup_history.jsonl
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+CHILD = """
+import asyncio, json, os, time
+launched = float(os.environ["STARTUP_BENCH_LAUNCHED"])
+result = {"interpreter": time.time() - launched}
+import main
+result["prompt"] = time.time() - launched
+plugins = main.create_plugins()
+main.create_concierge_agent(main.tool_tracer, plugins)
+result["ready"] = time.time() - launched
+if os.environ.get("STARTUP_BENCH_PREWARM"):
+    from utils.prewarm import prewarm
+    async def run():
+        steps = await prewarm(plugins)
+        await main.close_async_clients()
+        return steps
+    result["prewarm_steps"] = asyncio.run(run())
+    result["prewarm"] = time.time() - launched
+print(json.dumps(result))
+"""
+
+# --offline で使う、ネットワークに接続しない設定
+OFFLINE_ENV = {
+    "ROOM_STORE": "memory",
+    "EMBEDDINGS_BACKEND": "hash",
+    "AZURE_OPENAI_ENDPOINT": "https://offline.openai.azure.com/",
+    "AZURE_OPENAI_API_KEY": "offline",
+    "AZURE_OPENAI_API_VERSION": "2025-03-01-preview",
+    "AZURE_OPENAI_RESPONSES_DEPLOYMENT_NAME": "offline",
+}
+
+
+def run_once(env: dict) -> dict:
+    env = {**env, "STARTUP_BENCH_LAUNCHED": repr(time.time())}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prewarm", action="store_true", help="プリウォームの完了までを計測する")
+    parser.add_argument("--offline", action="store_true", help="ローカルストアとハッシュ埋め込みで計測する")
+    parser.add_argument("--history", default="", help="結果を追記する JSONL ファイル")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.offline:
+        env.update(OFFLINE_ENV)
+    if args.prewarm:
+        env["STARTUP_BENCH_PREWARM"] = "1"
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    phases = [phase for phase in ("interpreter", "prompt", "ready", "prewarm") if phase in runs[0]]
+    summary = {phase: statistics.median(run[phase] for run in runs) for phase in phases}
+    for phase in phases:
+        print(f"{phase:<12} p50={summary[phase]:.3f}s  min={min(run[phase] for run in runs):.3f}s")
+    if args.prewarm:
+        for step in runs[0]["prewarm_steps"]:
+            print(f"  {step:<26} p50={statistics.median(run['prewarm_steps'][step] for run in runs):.3f}s")
+
+    if args.history:
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "offline": args.offline,
+            "runs": args.runs,
+            **summary,
+        }
+        with open(args.history, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
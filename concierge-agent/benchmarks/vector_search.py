@@ -0,0 +1,122 @@
+"""ローカルのベクトルインデックスと Cosmos DB の VectorDistance 検索（客室タイプのカタログ）のレイテンシと再現率を比較するベンチマーク。
+
+concierge-agent ディレクトリで実行します:
+
+    python -m benchmarks.vector_search --top-k 3
+    python -m benchmarks.vector_search --synthetic 5000   # Cosmos DB を使わずに float32 と int8 を比較
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+
+from utils.client_pool import close_async_clients
+from utils.vector_index import VectorIndex
+
+DEFAULT_QUERIES = [
+    "オーシャンビュー",
+    "ロマンチックな部屋",
+    "ワークスペース付きの部屋",
+    "家族で泊まれる広い部屋",
+    "静かでリラックスできる部屋",
+    "車椅子で利用できる部屋",
+    "環境に配慮した部屋",
+    "キッチン付きの部屋",
+]
+
+
+def recall(results: list[list], truth: list[list]) -> float:
+    return statistics.mean(len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def report(label: str, latencies: list[float], value: float = None):
+    line = f"{label:<24} p50={statistics.median(latencies) * 1000:8.3f}ms  max={max(latencies) * 1000:8.3f}ms"
+    if value is not None:
+        line += f"  recall@k={value:.3f}"
+    print(line)
+
+
+def run_synthetic(args):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.synthetic, args.dimensions)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dimensions)).astype(np.float32).tolist()
+    docs = [
+        {"id": str(i), "roomType": str(i), "description": "", "price": "", "available": 0, "date": "",
+         "vectorDescription": vector}
+        for i, vector in enumerate(vectors.tolist())
+    ]
+    exact = VectorIndex()
+    exact.upsert(docs)
+    truth = [exact.search_many([q], args.top_k)[0] for q in queries]
+
+    for quantization in ("none", "int8"):
+        index = VectorIndex(quantization)
+        index.upsert(docs)
+        results, latencies = [], []
+        for query in queries:
+            rows, elapsed = timed(index.search_many, [query], args.top_k)
+            results.append(rows[0])
+            latencies.append(elapsed)
+        report(f"local ({quantization})", latencies, recall(results, truth))
+        _, elapsed = timed(index.search_many, queries, args.top_k)
+        print(f"{'':<24} バッチ検索 {len(queries)} 件: {elapsed * 1000:.3f}ms")
+
+
+async def run_cosmos(args):
+    from utils.cosmosdb_client_aio import AsyncCosmosDBClient
+    from utils.embeddings import embed_queries
+    from utils.vector_index import IndexedRoomStore
+
+    cosmos = AsyncCosmosDBClient()
+    queries = DEFAULT_QUERIES[:args.queries]
+    embeddings = await embed_queries(queries)
+
+    truth, latencies = [], []
+    for embedding in embeddings:
+        start = time.perf_counter()
+        items = await cosmos.search_room_types(embedding, args.top_k)
+        latencies.append(time.perf_counter() - start)
+        truth.append([item["roomType"] for item in items])
+    report("cosmos VectorDistance", latencies)
+
+    for quantization in ("none", "int8"):
+        store = IndexedRoomStore(cosmos, quantization=quantization)
+        start = time.perf_counter()
+        loaded = await store.refresh()
+        print(f"インデックス読み込み ({quantization}): {loaded} 件 / {time.perf_counter() - start:.2f}s")
+        results, latencies = [], []
+        for embedding in embeddings:
+            start = time.perf_counter()
+            items = await store.search_room_types(embedding, args.top_k)
+            latencies.append(time.perf_counter() - start)
+            results.append([item["roomType"] for item in items])
+        report(f"local ({quantization})", latencies, recall(results, truth))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=len(DEFAULT_QUERIES))
+    parser.add_argument("--synthetic", type=int, default=0, help="指定した件数のランダムベクトルでオフライン比較する")
+    parser.add_argument("--dimensions", type=int, default=1536, help="--synthetic 時のベクトル次元数")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args)
+        return
+    try:
+        await run_cosmos(args)
+    finally:
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import json
 import time
@@ -14,41 +15,119 @@ from skills.booking_skill import BookingPlugin
 from skills.dining_skill import DiningPlugin
 from skills.semantic_search_plugin import SemanticRoomSearchPlugin
 from skills.time_skill import TimePlugin
+from utils.client_pool import close_async_clients, get_model_cassette, get_model_http_client
+from utils.tool_tracing import call_key, tracer_from_env
 
 # Load environment variables
 load_dotenv()
 
-# Global list to accumulate intermediate messages per query.
-intermediate_steps = []
-# Dictionary to track tool call timestamps (for duration measurements).
-_tool_call_timestamps = {}
+# Per-call tool timings keyed by call_id (exported via TOOL_TRACE_FILE / TOOL_TRACE_OTEL).
+tool_tracer = tracer_from_env()
 
-async def handle_intermediate_steps(message: ChatMessageContent):
+# Define a set of simulated user queries covering various skills.
+simulated_queries = [
+    "明日のデラックスルームの空室状況を確認してください。",
+    "明日のデラックスルームを1室予約してください。",
+    "今日の日付を教えてください。",
+    "19:00に2名でディナーテーブルを予約したいです。",
+    "海が見える部屋を探しています。検索してもらえますか？"
+]
+
+def make_intermediate_handler(steps: list, label: str):
+    """
+    Returns a callback that captures one conversation's intermediate messages, including tool calls and results.
+    """
+    async def handle_intermediate_steps(message: ChatMessageContent):
+        steps.append(message)
+
+        for item in message.items:
+            if isinstance(item, FunctionCallContent):
+                print(f"{label} 🛠️  ツール実行 → {item.name}")
+                print(f"{label}    引数 → {item.arguments}")
+            elif isinstance(item, FunctionResultContent):
+                span = tool_tracer.get(call_key(item))
+                duration = f"{span.duration:.2f}s" if span and span.duration is not None else "N/A"
+                print(f"{label} ✅  ツール結果 {item.name} (実行時間: {duration})")
+                print(f"{label}    → {item.result}")
+
+    return handle_intermediate_steps
+
+def load_scripts(path: str) -> list[list[str]]:
+    """
+    Loads conversation scripts (one JSON array of user messages per line), or the built-in simulated queries.
     """
-    Callback to capture intermediate messages, including tool calls and results.
-    """    
-    global intermediate_steps
-    intermediate_steps.append(message)
-    
-    for item in message.items:
-        if isinstance(item, FunctionCallContent):
-            print(f"🛠️  ツール実行 → {item.name}")
-            print(f"   引数 → {item.arguments}")
-            _tool_call_timestamps[item.name] = time.time()
-        elif isinstance(item, FunctionResultContent):
-            start_time = _tool_call_timestamps.get(item.name)
-            duration = f"{(time.time() - start_time):.2f}s" if start_time else "N/A"
-            print(f"✅  ツール結果 {item.name} (実行時間: {duration})")
-            print(f"   → {item.result}")
-
-async def run_simulation():
+    if not path:
+        return [simulated_queries]
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+async def run_conversation(agent, script: list[str], label: str, tool_definitions_map: dict, write_record):
     """
-    Sets up the agent, runs a series of simulated queries against the agent,
-    and logs the entire interaction (user query, tool calls, and final response)
-    into a JSONL evaluation file.
+    Runs one conversation script on its own thread and writes a record for every turn as soon as it finishes.
+    """
+    thread = None  # Maintains conversation context within this script.
+    try:
+        for query in script:
+            print(f"\n{label} 👤 ユーザー: {query}")
+            intermediate_steps = []
+            final_response = ""
+
+            # Invoke the agent with the query; intermediate messages (tool calls/results) are captured via the callback.
+            async for response in agent.invoke(
+                messages=query,
+                thread=thread,
+                on_intermediate_message=make_intermediate_handler(intermediate_steps, label),
+                stream=False
+            ):
+                thread = response.thread
+                final_response = str(response.content)  # Explicitly convert to string.
+                print(f"{label} # ConciergeAgent: {final_response}\n")
+
+            # Extract tool call details from intermediate steps for logging.
+            tool_calls = []
+            for message in intermediate_steps:
+                for item in message.items:
+                    if isinstance(item, FunctionCallContent):
+                        # Ensure arguments are JSON-serializable (cast to string if not a dict).
+                        arguments = item.arguments if isinstance(item.arguments, dict) else str(item.arguments)
+                        tool_call_entry = {
+                            "type": "tool_call",
+                            "tool_call_id": call_key(item),  # The model's call_id, unique per call.
+                            "name": item.name,
+                            "arguments": arguments,
+                        }
+                        tool_calls.append(tool_call_entry)
+
+            # Derive a list of tool definitions for any tools used during the interaction.
+            used_tool_names = {call["name"].split("-", 1)[-1] for call in tool_calls}
+            tool_defs = [
+                tool_definitions_map[name]
+                for name in sorted(used_tool_names)
+                if name in tool_definitions_map
+            ]
+
+            # Build the record for this query simulation.
+            write_record({
+                "query": query,
+                "tool_calls": tool_calls,
+                "tool_definitions": tool_defs,
+                "response": final_response,
+            })
+    finally:
+        # Optional cleanup: delete thread if your system requires it.
+        if thread:
+            await thread.delete()
+
+async def run_simulation(scripts_path: str = "", output_path: str = "evaluation_dataset.jsonl",
+                         concurrency: int = 4, repeat: int = 1):
+    """
+    Sets up the agent, runs conversation scripts against the agent concurrently
+    (each on its own thread, at most `concurrency` at a time), and streams the entire
+    interaction (user query, tool calls, and final response) into a JSONL evaluation file.
     """
     # Setup agent resources and instantiate the agent with your skills.
-    client, model = AzureResponsesAgent.setup_resources()
+    # With MODEL_CASSETTE set, model requests are recorded to / replayed from a local cassette file.
+    client, model = AzureResponsesAgent.setup_resources(http_client=get_model_http_client())
     concierge_agent = AzureResponsesAgent(
         ai_model_id=model,
         client=client,
@@ -76,15 +155,7 @@ async def run_simulation():
             TimePlugin(),
         ],
     )
-
-    # Define a set of simulated user queries covering various skills.
-    simulated_queries = [
-        "明日のデラックスルームの空室状況を確認してください。",
-        "明日のデラックスルームを1室予約してください。",
-        "今日の日付を教えてください。",
-        "19:00に2名でディナーテーブルを予約したいです。",
-        "海が見える部屋を探しています。検索してもらえますか？"
-    ]
+    tool_tracer.register(concierge_agent.kernel)
 
     # Mapping of tool names to their definitions (reflecting your skill functions).
     tool_definitions_map = {
@@ -105,6 +176,28 @@ async def run_simulation():
                 }
             }
         },
+        "check_availability_bulk": {
+            "name": "check_availability_bulk",
+            "description": "Check availability for several room types over a date range in one call.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "room_types": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Room types to check."
+                    },
+                    "date_from": {
+                        "type": "string",
+                        "description": "First date in YYYY-MM-DD format."
+                    },
+                    "date_to": {
+                        "type": "string",
+                        "description": "Last date (inclusive) in YYYY-MM-DD format."
+                    }
+                }
+            }
+        },
         "confirm_booking": {
             "name": "confirm_booking",
             "description": "Confirm booking and reduce room count.",
@@ -152,6 +245,26 @@ async def run_simulation():
                     "query": {
                         "type": "string",
                         "description": "The description of the type of room the user is looking for."
+                    },
+                    "date_from": {
+                        "type": "string",
+                        "description": "Optional start of the stay date range in YYYY-MM-DD format."
+                    },
+                    "date_to": {
+                        "type": "string",
+                        "description": "Optional end of the stay date range in YYYY-MM-DD format."
+                    },
+                    "min_available": {
+                        "type": "integer",
+                        "description": "Minimum number of available rooms."
+                    },
+                    "max_price": {
+                        "type": "number",
+                        "description": "Maximum price per night (0 for no limit)."
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "Maximum number of rooms to return (1-10)."
                     }
                 }
             }
@@ -179,63 +292,48 @@ async def run_simulation():
         }
     }
 
-    # Open evaluation dataset file for writing in JSONL format.
-    with open("evaluation_dataset.jsonl", "w") as file:
-        thread = None  # Maintains conversation context if needed.
-        for query in simulated_queries:
-            print(f"\n👤 ユーザー: {query}")
-            global intermediate_steps
-            intermediate_steps = []  # Reset intermediate messages for current query.
-            final_response = ""
+    scripts = load_scripts(scripts_path) * repeat
+    semaphore = asyncio.Semaphore(concurrency)
+    written = 0
+    failed = 0
 
-            # Invoke the agent with the query; intermediate messages (tool calls/results) are captured via the callback.
-            async for response in concierge_agent.invoke(
-                messages=query,
-                thread=thread,
-                on_intermediate_message=handle_intermediate_steps,
-                stream=False
-            ):
-                thread = response.thread
-                final_response = str(response.content)  # Explicitly convert to string.
-                print(f"# ConciergeAgent: {final_response}\n")
+    # Open evaluation dataset file for writing in JSONL format; records are flushed as turns finish.
+    with open(output_path, "w", encoding="utf-8") as file:
+        def write_record(record: dict):
+            nonlocal written
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            written += 1
 
-            # Extract tool call details from intermediate steps for logging.
-            tool_calls = []
-            for message in intermediate_steps:
-                for item in message.items:
-                    if isinstance(item, FunctionCallContent):
-                        # Ensure arguments are JSON-serializable (cast to string if not a dict).
-                        arguments = item.arguments if isinstance(item.arguments, dict) else str(item.arguments)
-                        tool_call_entry = {
-                            "type": "tool_call",
-                            "tool_call_id": f"call_{int(time.time() * 1000)}",
-                            "name": item.name,
-                            "arguments": arguments,
-                        }
-                        tool_calls.append(tool_call_entry)
-
-            # Derive a list of tool definitions for any tools used during the interaction.
-            used_tool_names = {call["name"] for call in tool_calls}
-            tool_defs = [
-                tool_definitions_map[name]
-                for name in used_tool_names
-                if name in tool_definitions_map
-            ]
+        async def run_script(index: int, script: list[str]):
+            nonlocal failed
+            async with semaphore:
+                try:
+                    await run_conversation(concierge_agent, script, f"[{index}]", tool_definitions_map, write_record)
+                except Exception as e:
+                    failed += 1
+                    print(f"[{index}] ❌ 会話の実行に失敗しました: {e}")
 
-            # Build the record for this query simulation.
-            record = {
-                "query": query,
-                "tool_calls": tool_calls,
-                "tool_definitions": tool_defs,
-                "response": final_response,
-            }
-            file.write(json.dumps(record) + "\n")
+        start = time.perf_counter()
+        await asyncio.gather(*(run_script(index, script) for index, script in enumerate(scripts, 1)))
+        elapsed = time.perf_counter() - start
 
-        # Optional cleanup: delete thread if your system requires it.
-        if thread:
-            await thread.delete()
+    # Release the shared Cosmos DB / OpenAI connections.
+    await close_async_clients()
+    tool_tracer.print_summary()
+    tool_tracer.close()
+    cassette = get_model_cassette()
+    if cassette:
+        cassette.report()
 
-    print("シミュレーション完了。対話内容がevaluation_dataset.jsonlにログされました。")
+    print(f"会話 {len(scripts)} 件（失敗 {failed} 件）/ レコード {written} 件 / {elapsed:.1f}s")
+    print(f"シミュレーション完了。対話内容が{output_path}にログされました。")
 
 if __name__ == "__main__":
-    asyncio.run(run_simulation())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate an evaluation dataset by simulating conversations.")
+    parser.add_argument("--scripts", default="", help="JSONL file with one conversation (JSON array of messages) per line")
+    parser.add_argument("--output", default="evaluation_dataset.jsonl")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of conversations run at once")
+    parser.add_argument("--repeat", type=int, default=1, help="Run every script this many times")
+    args = parser.parse_args()
+    asyncio.run(run_simulation(args.scripts, args.output, args.concurrency, args.repeat))
\ No newline at end of file
@@ -1,46 +1,16 @@
 import asyncio
+import os
 import time
 from dotenv import load_dotenv
-from semantic_kernel.agents import AzureResponsesAgent
-from semantic_kernel.contents import (
-    ChatMessageContent, 
-    FunctionCallContent, 
-    FunctionResultContent,
-)
-
-from skills.booking_skill import BookingPlugin
-from skills.dining_skill import DiningPlugin
-from skills.time_skill import TimePlugin
-from skills.semantic_search_plugin import SemanticRoomSearchPlugin
 
-load_dotenv()
-
-intermediate_steps = []
-_tool_call_timestamps = {}
+# semantic_kernel とプラグインの import には数秒かかるため、プロンプトを表示してから
+# バックグラウンドで読み込む（create_concierge_agent / handle_intermediate_steps の中で import）
+from utils.client_pool import close_async_clients, get_model_http_client
+from utils.tool_tracing import ToolTracer, call_key, tracer_from_env
 
-async def handle_intermediate_steps(message: ChatMessageContent):
-    intermediate_steps.append(message)
-    
-    for item in message.items:
-        if isinstance(item, FunctionCallContent):
-            print(f"\033[1;36m🛠️  ツール実行 → {item.name}\033[0m")
-            print(f"   引数 → {item.arguments}")
-            _tool_call_timestamps[item.name] = time.time()
-
-        elif isinstance(item, FunctionResultContent):
-            start_time = _tool_call_timestamps.get(item.name, None)
-            duration = f"{(time.time() - start_time):.2f}s" if start_time else "N/A"
-            print(f"\033[1;32m✅ ツール結果 {item.name} (実行時間: {duration})\033[0m")
-            print(f"   → {item.result}")
-
-async def main():
-    client, model = AzureResponsesAgent.setup_resources()
+load_dotenv()
 
-    concierge_agent = AzureResponsesAgent(
-        ai_model_id=model,
-        client=client,
-        name="ConciergeAgent",
-        instructions="""
+CONCIERGE_INSTRUCTIONS = """
         あなたは高級ホテルのスマートコンシェルジュです。名前は「ロビーボーイ」です。
 
         あなたの仕事は以下の通りです：
@@ -54,6 +24,8 @@ async def main():
         - 最も類似度が高い、またはキーワードに直接マッチする客室を優先する
         - 必要に応じて、なぜその客室を提案するかを説明する
 
+        複数の客室タイプや複数の日付の空室状況を確認する場合は、check_availability を繰り返さず check_availability_bulk で一度に確認してください。
+
         予約などのツールを使用する際は、まず空室状況を確認し、客室が利用可能な場合のみ予約を確定してください（同じステップで両方を行わない）。
         確定前に予約詳細（客室タイプ、1泊あたりの料金、日程、合計金額など）を要約する必要があります。
 
@@ -61,35 +33,162 @@ async def main():
         
         あなたは多言語を話しますが、デフォルトの言語は日本語です。
         ユーザーが他の言語で話す場合は、その言語に切り替えることができます。
-        """,
-        plugins=[
-            BookingPlugin(),
-            DiningPlugin(),
-            SemanticRoomSearchPlugin(),
-            TimePlugin(),
-        ],
+        """
+
+# 現在のターンの中間メッセージ（ターンごとにクリア）
+intermediate_steps = []
+# プリウォームなどのバックグラウンドタスク（終了時にキャンセル）
+background_tasks = set()
+# call_id ごとのツール実行時間（TOOL_TRACE_FILE / TOOL_TRACE_OTEL で出力先を指定）
+tool_tracer = tracer_from_env()
+
+async def handle_intermediate_steps(message: "ChatMessageContent"):
+    from semantic_kernel.contents import FunctionCallContent, FunctionResultContent
+
+    intermediate_steps.append(message)
+    
+    for item in message.items:
+        if isinstance(item, FunctionCallContent):
+            print(f"\033[1;36m🛠️  ツール実行 → {item.name}\033[0m")
+            print(f"   引数 → {item.arguments}")
+
+        elif isinstance(item, FunctionResultContent):
+            span = tool_tracer.get(call_key(item))
+            duration = f"{span.duration:.2f}s" if span and span.duration is not None else "N/A"
+            print(f"\033[1;32m✅ ツール結果 {item.name} (実行時間: {duration})\033[0m")
+            print(f"   → {item.result}")
+
+async def run_turn(agent: "AzureResponsesAgent", user_input: str, thread, stream: bool,
+                   context: "ConversationContext" = None):
+    """1 ターン分の応答を表示し、最初のトークンまでの時間（TTFT）と合計レイテンシを報告します。
+
+    context を指定すると、会話がトークン予算を超えたときにスレッドを要約付きの新しいスレッドに切り替えます。
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    intermediate_steps.clear()
+    request = context.prepare(user_input) if context else {"messages": user_input}
+    response_text = []
+
+    if stream:
+        async for response in agent.invoke_stream(
+            **request,
+            thread=thread,
+            on_intermediate_message=handle_intermediate_steps,
+        ):
+            thread = response.thread
+            if not response.content:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                print("# ConciergeAgent: ", end="", flush=True)
+            print(response.content, end="", flush=True)
+            response_text.append(response.content)
+        print("\n")
+    else:
+        async for response in agent.invoke(
+            **request,
+            thread=thread,
+            on_intermediate_message=handle_intermediate_steps,
+            stream=False,
+        ):
+            thread = response.thread
+            first_token_at = first_token_at or time.perf_counter()
+            print(f"# ConciergeAgent: {response.content}\n")
+            intermediate_steps.append(response.message)
+            response_text.append(str(response.content))
+
+    total = time.perf_counter() - start
+    ttft = f"{first_token_at - start:.2f}s" if first_token_at else "N/A"
+    stats = f"最初のトークンまで: {ttft} / 合計: {total:.2f}s"
+    if context:
+        thread = await context.after_turn(thread, user_input, list(intermediate_steps), "".join(response_text))
+        stats += f" / コンテキスト: 約{context.thread_tokens}トークン"
+    print(f"\033[2m⏱️  {stats}\033[0m\n")
+    return thread
+
+def create_plugins() -> list:
+    from skills.booking_skill import BookingPlugin
+    from skills.dining_skill import DiningPlugin
+    from skills.semantic_search_plugin import SemanticRoomSearchPlugin
+    from skills.time_skill import TimePlugin
+
+    return [BookingPlugin(), DiningPlugin(), SemanticRoomSearchPlugin(), TimePlugin()]
+
+def create_concierge_agent(tracer: ToolTracer = None, plugins: list = None,
+                           client: "AsyncAzureOpenAI" = None, model: str = None) -> "AzureResponsesAgent":
+    """ConciergeAgent を作成します。プラグインとクライアントはエージェント（とその全スレッド）で共有されます。
+
+    client を省略すると setup_resources で作成します（API キーがなければ Entra ID のトークンを取得します）。
+    ストアなどのクライアントは最初のツール呼び出し（または prewarm）で初期化されます。
+    tracer を指定すると、エージェントのカーネルでのツール呼び出しを記録します。
+    """
+    from semantic_kernel.agents import AzureResponsesAgent
+
+    if client is None:
+        # 埋め込みと同じ共有の HTTP クライアント（接続プール）を使う
+        client, model = AzureResponsesAgent.setup_resources(http_client=get_model_http_client())
+    agent = AzureResponsesAgent(
+        ai_model_id=model or os.getenv("AZURE_OPENAI_RESPONSES_DEPLOYMENT_NAME"),
+        client=client,
+        name="ConciergeAgent",
+        instructions=CONCIERGE_INSTRUCTIONS,
+        plugins=plugins if plugins is not None else create_plugins(),
     )
+    if tracer:
+        tracer.register(agent.kernel)
+    return agent
+
+async def load_concierge_agent(prewarm: bool = True):
+    """エージェントをワーカースレッドで読み込み、必要に応じてクライアントのプリウォームをバックグラウンドで開始します。"""
+    plugins = await asyncio.to_thread(create_plugins)
+    agent = await asyncio.to_thread(create_concierge_agent, tool_tracer, plugins)
+    if prewarm:
+        from utils.prewarm import prewarm as run_prewarm
+        task = asyncio.create_task(run_prewarm(plugins))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    return agent
+
+async def main():
+    # プロンプトを先に表示し、ゲストが入力しているあいだにエージェントを読み込む
+    # CONCIERGE_PREWARM=false でクライアントのプリウォームを無効化できます
+    agent_task = asyncio.create_task(
+        load_concierge_agent(prewarm=os.getenv("CONCIERGE_PREWARM", "true").lower() != "false")
+    )
+    concierge_agent = None
+    context = None
 
     thread = None
+    # CONCIERGE_STREAMING=false で応答全体を待ってから表示する従来の動作に戻せます
+    stream = os.getenv("CONCIERGE_STREAMING", "true").lower() != "false"
 
     print("🛎️  スマートホスピタリティアシスタントへようこそ")
     print("下にメッセージを入力してください。終了するには'exit'または'終了'と入力してください。\n")
 
     while True:
-        user_input = input("👤 ユーザー: ")
+        user_input = await asyncio.to_thread(input, "👤 ユーザー: ")
         if user_input.lower() in ["exit", "quit", "終了", "やめる"]:
             break
 
-        async for response in concierge_agent.invoke(
-            messages=user_input,
-            thread=thread,
-            on_intermediate_message=handle_intermediate_steps,
-            stream=False,
-        ):
-            thread = response.thread
-            print(f"# ConciergeAgent: {response.content}\n")
+        if concierge_agent is None:
+            from utils.conversation_context import ConversationContext
+
+            concierge_agent = await agent_task
+            # CONTEXT_MAX_TOKENS などの設定に従って、長い会話を要約しながらスレッドを切り替える
+            context = ConversationContext.for_agent(concierge_agent)
+
+        thread = await run_turn(concierge_agent, user_input, thread, stream, context)
 
-    await thread.delete() if thread else None
+    pending = [agent_task, *background_tasks]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    if thread:
+        await thread.delete()
+    await close_async_clients()
+    tool_tracer.print_summary()
+    tool_tracer.close()
     print("👋 セッション終了")
 
 if __name__ == "__main__":
@@ -0,0 +1,366 @@
+"""ConciergeAgent を HTTP / Server-Sent Events で公開する非同期サーバー。
+
+セッションごとにエージェントスレッドを保持し、一定時間使われなかったセッションはスレッドを削除して破棄します。
+プラグインとクライアントは全セッションで共有し、同時に実行するターン数と待ち行列の長さを制限します。
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+エンドポイント:
+    POST   /sessions                      セッションを作成
+    POST   /sessions/{session_id}/messages メッセージを送信し、応答を SSE でストリーミング
+    DELETE /sessions/{session_id}         セッションを終了
+    GET    /healthz                       ヘルスチェック
+    GET    /metrics                       セッション数・同時実行数・レイテンシなどの統計
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from semantic_kernel.contents import ChatMessageContent, FunctionCallContent, FunctionResultContent
+
+from main import create_concierge_agent, create_plugins
+from utils.client_pool import close_async_clients
+from utils.conversation_context import ConversationContext
+from utils.latency import latency_summary
+from utils.prewarm import prewarm
+from utils.tool_tracing import call_key, tracer_from_env
+
+load_dotenv()
+
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", "16"))
+MAX_QUEUED_TURNS = int(os.getenv("MAX_QUEUED_TURNS", "64"))
+
+
+class MessageRequest(BaseModel):
+    message: str
+
+
+@dataclass
+class Session:
+    id: str
+    thread: Optional[object] = None
+    context: Optional[ConversationContext] = None
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # 実行中のターンの枠（lock を保持しているターン）
+    slot: Optional["TurnSlot"] = None
+
+
+class Overloaded(Exception):
+    pass
+
+
+class TurnLimiter:
+    """同時に実行するターン数を制限し、待ち行列が上限を超えたリクエストは受け付けません。"""
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.running = 0
+        self.queued = 0
+
+    def reserve(self) -> "TurnSlot":
+        """実行または待機の枠を予約します。空きがなければ Overloaded を送出します。
+
+        リクエストの受付時に同期的に呼び出すため、同時に届いたリクエストも上限を超えて受け付けません。
+        """
+        if self.running + self.queued >= self.max_concurrent + self.max_queued:
+            raise Overloaded()
+        self.queued += 1
+        return TurnSlot(self)
+
+
+class TurnSlot:
+    """TurnLimiter で予約した 1 ターン分の枠。async with で実行枠を待ち、release は何度呼んでも安全です。"""
+
+    def __init__(self, limiter: TurnLimiter):
+        self.limiter = limiter
+        self.state = "queued"
+
+    async def __aenter__(self):
+        try:
+            await self.limiter._semaphore.acquire()
+        except BaseException:
+            self.release()
+            raise
+        self.limiter.queued -= 1
+        self.limiter.running += 1
+        self.state = "running"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def release(self):
+        if self.state == "queued":
+            self.limiter.queued -= 1
+        elif self.state == "running":
+            self.limiter.running -= 1
+            self.limiter._semaphore.release()
+        self.state = "released"
+
+
+class SessionManager:
+    """セッション ID とエージェントスレッドの対応を管理し、アイドル状態のセッションを破棄します。"""
+
+    def __init__(self, idle_seconds: float, max_sessions: int):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions: dict[str, Session] = {}
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, context: ConversationContext) -> Session:
+        if len(self._sessions) >= self.max_sessions:
+            raise Overloaded()
+        session = Session(id=uuid.uuid4().hex, context=context)
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session:
+            session.last_used = time.monotonic()
+        return session
+
+    async def close(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        async with session.lock:
+            if session.thread:
+                await session.thread.delete()
+        return True
+
+    async def evict_idle(self) -> int:
+        deadline = time.monotonic() - self.idle_seconds
+        expired = [
+            session.id for session in self._sessions.values()
+            if session.last_used < deadline and not session.lock.locked()
+        ]
+        for session_id in expired:
+            try:
+                await self.close(session_id)
+            except Exception as e:
+                print(f"セッション {session_id} のスレッド削除に失敗しました: {e}")
+        self.evicted += len(expired)
+        return len(expired)
+
+    async def run_evictor(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+
+    async def close_all(self):
+        for session_id in list(self._sessions):
+            try:
+                await self.close(session_id)
+            except Exception as e:
+                print(f"セッション {session_id} のスレッド削除に失敗しました: {e}")
+
+
+class Metrics:
+    def __init__(self, window: int = 1000):
+        self.turns = 0
+        self.failed = 0
+        self.rejected = 0
+        self.ttft = deque(maxlen=window)
+        self.latency = deque(maxlen=window)
+
+    def summary(self) -> dict:
+        return {
+            "turns": self.turns,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "ttft_seconds": latency_summary(self.ttft),
+            "latency_seconds": latency_summary(self.latency),
+        }
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def tool_events(message: ChatMessageContent) -> list[str]:
+    events = []
+    for item in message.items:
+        if isinstance(item, FunctionCallContent):
+            events.append(sse("tool_call", {"id": call_key(item), "name": item.name, "arguments": item.arguments}))
+        elif isinstance(item, FunctionResultContent):
+            events.append(sse("tool_result", {"id": call_key(item), "name": item.name, "result": str(item.result)}))
+    return events
+
+
+sessions = SessionManager(SESSION_IDLE_SECONDS, MAX_SESSIONS)
+limiter = TurnLimiter(MAX_CONCURRENT_TURNS, MAX_QUEUED_TURNS)
+metrics = Metrics()
+tool_tracer = tracer_from_env()
+state = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    plugins = create_plugins()
+    state["agent"] = create_concierge_agent(tool_tracer, plugins)
+    # 最初のリクエストの前に接続・インデックス・クエリ埋め込みを準備しておく
+    await prewarm(plugins)
+    evictor = asyncio.create_task(sessions.run_evictor(min(60.0, SESSION_IDLE_SECONDS)))
+    try:
+        yield
+    finally:
+        evictor.cancel()
+        await sessions.close_all()
+        await close_async_clients()
+        tool_tracer.close()
+
+
+app = FastAPI(title="ConciergeAgent", lifespan=lifespan)
+
+
+@app.post("/sessions", status_code=201)
+async def create_session():
+    try:
+        session = sessions.create(ConversationContext.for_agent(state["agent"]))
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="セッション数が上限に達しています。", headers={"Retry-After": "30"})
+    return {"session_id": session.id}
+
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    if not await sessions.close(session_id):
+        raise HTTPException(status_code=404, detail="セッションが見つかりません。")
+
+
+@app.post("/sessions/{session_id}/messages")
+async def post_message(session_id: str, request: MessageRequest):
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="セッションが見つかりません。")
+    if session.lock.locked():
+        raise HTTPException(status_code=409, detail="このセッションでは前の応答を処理中です。")
+    try:
+        slot = limiter.reserve()
+    except Overloaded:
+        metrics.rejected += 1
+        raise HTTPException(status_code=503, detail="混み合っています。しばらくしてから再度お試しください。",
+                            headers={"Retry-After": "5"})
+    # ロックは空いているため待たずに取得できる（確認から取得までの間に他のリクエストは割り込まない）。
+    # 応答を返す前にセッションと枠を確保し、同じセッションへの次のリクエストは 409 にする
+    await session.lock.acquire()
+    session.slot = slot
+
+    return StreamingResponse(
+        stream_turn(session, request.message, slot),
+        media_type="text/event-stream",
+        # ストリームが開始されずに終わった場合も、セッションと枠を確実に解放する
+        background=BackgroundTask(end_turn, session, slot),
+    )
+
+
+async def end_turn(session: Session, slot: TurnSlot):
+    """ターンの枠とセッションのロックを解放します。何度呼び出しても安全です。"""
+    slot.release()
+    if session.slot is slot:
+        session.slot = None
+        session.last_used = time.monotonic()
+        session.lock.release()
+
+
+async def stream_turn(session: Session, message: str, slot: TurnSlot):
+    pending: list[str] = []
+    messages: list[ChatMessageContent] = []
+    response_text: list[str] = []
+
+    async def on_intermediate_message(msg: ChatMessageContent):
+        messages.append(msg)
+        pending.extend(tool_events(msg))
+
+    start = time.perf_counter()
+    first_token_at = None
+    # ターンの結果をセッションに反映し終えたか（失敗・切断したターンの後始末を一度だけ行う）
+    settled = False
+    try:
+        async with slot:
+            async for response in state["agent"].invoke_stream(
+                **session.context.prepare(message),
+                thread=session.thread,
+                on_intermediate_message=on_intermediate_message,
+            ):
+                session.thread = response.thread
+                while pending:
+                    yield pending.pop(0)
+                if not response.content:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.ttft.append(first_token_at - start)
+                response_text.append(response.content)
+                yield sse("token", {"text": response.content})
+        while pending:
+            yield pending.pop(0)
+        session.thread = await session.context.after_turn(
+            session.thread, message, messages, "".join(response_text)
+        )
+        settled = True
+    except Exception as e:
+        metrics.failed += 1
+        session.thread = await session.context.abandon_turn(session.thread)
+        settled = True
+        await end_turn(session, slot)
+        yield sse("error", {"message": str(e)})
+        return
+    finally:
+        if not settled:
+            # クライアントの切断で取り消されたターン
+            session.thread = await session.context.abandon_turn(session.thread)
+        # クライアントの切断による取り消しを含め、最後のイベントを送る前にセッションを解放する
+        await end_turn(session, slot)
+
+    total = time.perf_counter() - start
+    metrics.turns += 1
+    metrics.latency.append(total)
+    yield sse("done", {
+        "ttft_seconds": first_token_at - start if first_token_at else None,
+        "total_seconds": total,
+        "context_tokens": session.context.thread_tokens,
+    })
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok" if "agent" in state else "starting"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "sessions": len(sessions),
+        "evicted_sessions": sessions.evicted,
+        "running_turns": limiter.running,
+        "queued_turns": limiter.queued,
+        **metrics.summary(),
+        "tools": tool_tracer.summary(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.getenv("SERVER_HOST", "127.0.0.1"), port=int(os.getenv("SERVER_PORT", "8000")))
@@ -1,36 +1,100 @@
+import os
+from datetime import date as Date, timedelta
 from typing import Annotated
 from semantic_kernel.functions import kernel_function
-from utils.cosmosdb_client import CosmosDBClient
+from utils.availability_cache import AvailabilityCache
+from utils.client_pool import get_room_store
+
+# 一括確認で 1 回に扱う上限（ツール結果のトークン数を抑える）
+MAX_BULK_ROOM_TYPES = 10
+MAX_BULK_DAYS = 31
 
 class BookingPlugin:
     def __init__(self):
-        self.db = CosmosDBClient()    
-    
+        self.cache = AvailabilityCache(
+            ttl_seconds=float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "15")),
+            max_size=int(os.getenv("AVAILABILITY_CACHE_MAX_SIZE", "1024")),
+        )
+
+    @property
+    def db(self):
+        # ストア（と Cosmos DB クライアント）は最初のツール呼び出しで生成する
+        return get_room_store()
+
     @kernel_function(description="指定された日付で客室が利用可能かどうかを確認します。")
-    def check_availability(
+    async def check_availability(
         self,
         room_type: Annotated[str, "客室タイプ"],
         date: Annotated[str, "予約日"]
     ) -> Annotated[str, "空室情報"]:
         room_type = room_type.lower()
-        
-        room = self.db.get_room_availability(room_type, date)
+
+        room = await self.cache.get_or_load(room_type, date, self.db.get_room_availability)
         if room and room["available"] > 0:
             return f"{date}に{room['available']}室の{room_type}が空いています。料金: {room['price']}"
         return f"申し訳ございませんが、{date}に{room_type}の空室はございません。"
 
+    @kernel_function(description="複数の客室タイプについて、期間内の各日の空室状況をまとめて確認します。")
+    async def check_availability_bulk(
+        self,
+        room_types: Annotated[list[str], "客室タイプのリスト"],
+        date_from: Annotated[str, "開始日（YYYY-MM-DD）"],
+        date_to: Annotated[str, "終了日（YYYY-MM-DD、開始日を含む）"] = "",
+    ) -> Annotated[str, "日付 × 客室タイプの空室表"]:
+        room_types = list(dict.fromkeys(room_type.lower() for room_type in room_types))
+        try:
+            start = Date.fromisoformat(date_from)
+            end = Date.fromisoformat(date_to) if date_to else start
+        except ValueError:
+            return "日付は YYYY-MM-DD 形式で指定してください。"
+        days = (end - start).days + 1
+        if not room_types or days < 1:
+            return "客室タイプと有効な期間を指定してください。"
+        if len(room_types) > MAX_BULK_ROOM_TYPES or days > MAX_BULK_DAYS:
+            return f"一度に確認できるのは客室タイプ{MAX_BULK_ROOM_TYPES}件、{MAX_BULK_DAYS}日分までです。"
+
+        # check_availability と同じキャッシュを使い、キャッシュにない (客室タイプ, 日付) だけをまとめて読み取る
+        dates = [(start + timedelta(days=offset)).isoformat() for offset in range(days)]
+        cells = await self.cache.get_or_load_many(room_types, dates, self._load_range)
+
+        lines = ["日付 | " + " | ".join(room_types)]
+        for day in dates:
+            row = []
+            for room_type in room_types:
+                record = cells.get((room_type, day))
+                if record is None:
+                    row.append("-")
+                elif record["available"] > 0:
+                    row.append(f"{record['available']}室 {record['price']}")
+                else:
+                    row.append("満室")
+            lines.append(f"{day} | " + " | ".join(row))
+        lines.append("（-: 該当する客室データなし）")
+        return "\n".join(lines)
+
+    async def _load_range(self, room_types: list[str], dates: list[str]) -> dict:
+        records = await self.db.get_availability_range(room_types, dates[0], dates[-1])
+        return {(record["roomType"], record["date"]): record for record in records}
+
     @kernel_function(description="予約を確定し、客室数を減らします。")
-    def confirm_booking(
+    async def confirm_booking(
         self,
         room_type: Annotated[str, "客室タイプ"],
         date: Annotated[str, "予約日"],
         count: Annotated[int, "予約する客室数"]
     ) -> Annotated[str, "確認メッセージ"]:
+        if count < 1:
+            # 0 以下の値で減算すると在庫が増えるため、ストアに触れる前に拒否する
+            return "予約する客室数は1以上で指定してください。"
         room_type = room_type.lower()
-        room = self.db.get_room_availability(room_type, date)
+        updated = await self.db.update_room_count(room_type, date, count)
+        if updated:
+            self.cache.put(room_type, date, updated)
+            return f"✅ {date}に{count}室の{room_type}を{updated['price']}で予約確定いたしました。"
+
+        # 予約できなかった場合のみ、理由を案内するために現在の状態を読み取る
+        room = await self.db.get_room_availability(room_type, date)
+        self.cache.put(room_type, date, room)
         if not room:
             return f"{date}に{room_type}の客室が見つかりませんでした。"
-        if room["available"] < count:
-            return f"{date}に{room_type}は{room['available']}室のみ空いています。"
-        updated = self.db.update_room_count(room_type, date, count)
-        return f"✅ {date}に{count}室の{room_type}を{room['price']}で予約確定いたしました。"
\ No newline at end of file
+        return f"{date}に{room_type}は{room['available']}室のみ空いています。"
@@ -1,45 +1,58 @@
+import os
 from typing import Annotated
 from semantic_kernel.functions import kernel_function
-from utils.cosmosdb_client import CosmosDBClient
-from openai import AzureOpenAI
-import os
+from utils.client_pool import get_room_store
+from utils.embeddings import embed_queries, embed_text
+from utils.query_embedding_cache import QueryEmbeddingCache
 
 class SemanticRoomSearchPlugin:
     def __init__(self):
-        self.db = CosmosDBClient()
-        self.openai = AzureOpenAI(
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        self.query_cache = QueryEmbeddingCache(
+            max_size=int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_SIZE", "1024")),
         )
-        self.embedding_model = os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT")
-
-    def embed_query(self, text: str) -> list[float]:
-        return self.openai.embeddings.create(
-            input=[text],
-            model=self.embedding_model
-        ).data[0].embedding    
-    
-    @kernel_function(description="セマンティック検索でホテルの客室を検索します。")
-    def search_rooms_by_description(
-        self,
-        query: Annotated[str, "ユーザーが探している客室タイプの説明。"]
-    ) -> Annotated[str, "リクエストにマッチする客室の短いリストを返します。"]:
-        embedding = self.embed_query(query)
 
-        sql_query = """
-        SELECT TOP 3 r.roomType, r.description, r.price, r.available, r.date
-        FROM rooms r
-        ORDER BY VectorDistance(r.vectorDescription, @embedding)
+    @property
+    def db(self):
+        # ストア（と Cosmos DB クライアント）は最初のツール呼び出しで生成する
+        return get_room_store()
+
+    async def embed_query(self, text: str) -> list[float]:
+        return await self.query_cache.get_or_embed(text, embed_text)
+
+    async def warm_up(self, path: str = None) -> int:
+        """頻出クエリのファイル（1 行 1 クエリ）からクエリ埋め込みキャッシュを事前に作成します。
+
+        ローカルのベクトルインデックスを使う場合は、あわせてコンテナーから読み込みます。
         """
+        if hasattr(self.db, "refresh"):
+            await self.db.refresh()
+        path = path or os.getenv("QUERY_EMBEDDING_WARMUP_FILE")
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as file:
+            queries = [line.strip() for line in file if line.strip()]
+        return await self.query_cache.warm_up(queries, embed_queries)
 
-        results = self.db.container.query_items(
-            query=sql_query,
-            parameters=[
-                {"name": "@embedding", "value": embedding}
-            ],
-            enable_cross_partition_query=True
-        )        
+    @kernel_function(description="セマンティック検索でホテルの客室を検索します。日付・空室数・料金で絞り込めます。")
+    async def search_rooms_by_description(
+        self,
+        query: Annotated[str, "ユーザーが探している客室タイプの説明。"],
+        date_from: Annotated[str, "宿泊日の範囲の開始日（YYYY-MM-DD、省略可）。"] = "",
+        date_to: Annotated[str, "宿泊日の範囲の終了日（YYYY-MM-DD、省略可）。1日だけの場合は開始日と同じ日付。"] = "",
+        min_available: Annotated[int, "必要な最小空室数。"] = 1,
+        max_price: Annotated[float, "1泊あたりの料金の上限（0 は上限なし）。"] = 0,
+        top_k: Annotated[int, "返す客室の最大数（1〜10）。"] = 3,
+    ) -> Annotated[str, "リクエストにマッチする客室の短いリストを返します。"]:
+        embedding = await self.embed_query(query)
+
+        results = await self.db.search_rooms(
+            embedding,
+            top_k=max(1, min(top_k, 10)),
+            date_from=date_from or None,
+            date_to=date_to or None,
+            min_available=max(0, min_available),
+            max_price=max_price or None,
+        )
         output = ""
         for item in results:
             output += (
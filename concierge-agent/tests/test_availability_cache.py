@@ -0,0 +1,77 @@
+import asyncio
+
+from utils.availability_cache import AvailabilityCache
+
+
+def test_follower_recovers_when_owner_is_cancelled():
+    async def scenario():
+        cache = AvailabilityCache(ttl_seconds=60)
+        started = asyncio.Event()
+        calls = []
+
+        async def slow_loader(room_type, date):
+            calls.append("slow")
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast_loader(room_type, date):
+            calls.append("fast")
+            return {"available": 3}
+
+        owner = asyncio.create_task(cache.get_or_load("suite", "2025-06-01", slow_loader))
+        await started.wait()
+        follower = asyncio.create_task(cache.get_or_load("suite", "2025-06-01", fast_loader))
+        await asyncio.sleep(0)
+
+        owner.cancel()
+        result = await asyncio.wait_for(follower, 1)
+
+        assert owner.cancelled()
+        assert result == {"available": 3}
+        assert calls == ["slow", "fast"]
+        assert not cache._inflight
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = AvailabilityCache(ttl_seconds=60)
+        calls = []
+
+        async def loader(room_type, date):
+            calls.append((room_type, date))
+            await asyncio.sleep(0.01)
+            return {"available": 1}
+
+        results = await asyncio.gather(*(cache.get_or_load("suite", "2025-06-01", loader) for _ in range(5)))
+
+        assert results == [{"available": 1}] * 5
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_bulk_lookup_shares_entries_with_single_lookups():
+    async def scenario():
+        cache = AvailabilityCache(ttl_seconds=60)
+        calls = []
+
+        async def single_loader(room_type, date):
+            calls.append(("single", room_type, date))
+            return {"available": 1}
+
+        async def range_loader(room_types, dates):
+            calls.append(("range", tuple(room_types), tuple(dates)))
+            return {(room_type, date): {"available": 2} for room_type in room_types for date in dates}
+
+        await cache.get_or_load("suite", "2025-06-01", single_loader)
+        cells = await cache.get_or_load_many(["suite"], ["2025-06-01", "2025-06-02"], range_loader)
+        single = await cache.get_or_load("suite", "2025-06-02", single_loader)
+
+        assert cells == {("suite", "2025-06-01"): {"available": 1}, ("suite", "2025-06-02"): {"available": 2}}
+        assert single == {"available": 2}
+        assert calls == [("single", "suite", "2025-06-01"), ("range", ("suite",), ("2025-06-02",))]
+        assert not cache._inflight
+
+    asyncio.run(scenario())
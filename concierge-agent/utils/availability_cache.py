@@ -0,0 +1,186 @@
+"""空室状況のリードスルーキャッシュ。
+
+同じ客室タイプ・日付への問い合わせを TTL の間だけプロセス内で再利用し、
+Cosmos DB への読み取り (RU) を削減します。
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class AvailabilityCache:
+    """TTL 付き・サイズ上限付き (LRU) のキャッシュ。
+
+    同じキーへの同時ミスは 1 回の読み取りにまとめられます（single-flight）。
+    レコードが存在しないという結果 (None) もキャッシュします。
+    """
+
+    def __init__(self, ttl_seconds: float = 15.0, max_size: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def put(self, room_type: str, date: str, value):
+        """書き込み後の最新ドキュメントでエントリーを更新します。"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._writes += 1
+            self._store((room_type, date), value)
+
+    def invalidate(self, room_type: str, date: str):
+        with self._lock:
+            self._writes += 1
+            self._entries.pop((room_type, date), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    async def get_or_load(self, room_type: str, date: str, loader):
+        """キャッシュを参照し、ミスした場合は loader(room_type, date) の結果を格納して返します。"""
+        if not self.enabled:
+            return await loader(room_type, date)
+
+        key = (room_type, date)
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            pending = self._inflight.get(key)
+            owner = pending is None
+            # 進行中の読み取りに相乗りした場合は Cosmos DB に到達しないためヒットとして数える
+            if not owner:
+                self.hits += 1
+            else:
+                self.misses += 1
+                pending = asyncio.get_running_loop().create_future()
+                self._inflight[key] = pending
+                writes_before_load = self._writes
+
+        if not owner:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # 待機者自身が取り消された
+                # 読み取りの所有者が取り消された場合は、改めて読み取る
+                return await self.get_or_load(room_type, date, loader)
+
+        try:
+            value = await loader(room_type, date)
+        except Exception as e:
+            pending.set_exception(e)
+            # 待機者がいない場合に "Future exception was never retrieved" を出さない
+            pending.exception()
+            raise
+        else:
+            pending.set_result(value)
+            with self._lock:
+                # 読み取り中に書き込みがあった場合は古い値でエントリーを上書きしない
+                if self._writes == writes_before_load:
+                    self._store(key, value)
+            return value
+        finally:
+            # 所有者が取り消された（CancelledError は Exception ではない）場合も待機者を解放する
+            if not pending.done():
+                pending.cancel()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_load_many(self, room_types: list[str], dates: list[str], loader) -> dict:
+        """客室タイプ × 日付の各キーをまとめて参照し、ミスしたキーだけを 1 回の loader 呼び出しで読み取ります。
+
+        loader(room_types, dates) は {(room_type, date): value} を返します。結果にないキーは None（レコードなし）
+        として格納します。get_or_load と同じエントリーを共有し、同じキーへの進行中の読み取りには相乗りします。
+        """
+        keys = [(room_type, date) for room_type in room_types for date in dates]
+        if not self.enabled:
+            loaded = await loader(room_types, dates)
+            return {key: loaded.get(key) for key in keys}
+
+        results, waiting, owned = {}, {}, {}
+        with self._lock:
+            for key in keys:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    results[key] = value
+                elif key in self._inflight:
+                    self.hits += 1
+                    waiting[key] = self._inflight[key]
+                else:
+                    self.misses += 1
+                    owned[key] = self._inflight[key] = asyncio.get_running_loop().create_future()
+            writes_before_load = self._writes
+
+        if owned:
+            try:
+                loaded = await loader(
+                    sorted({room_type for room_type, _ in owned}), sorted({date for _, date in owned})
+                )
+            except Exception as e:
+                for pending in owned.values():
+                    pending.set_exception(e)
+                    pending.exception()
+                raise
+            else:
+                with self._lock:
+                    for key, pending in owned.items():
+                        results[key] = loaded.get(key)
+                        pending.set_result(results[key])
+                        if self._writes == writes_before_load:
+                            self._store(key, results[key])
+            finally:
+                with self._lock:
+                    for key, pending in owned.items():
+                        if not pending.done():
+                            pending.cancel()
+                        self._inflight.pop(key, None)
+
+        for key, pending in waiting.items():
+            try:
+                results[key] = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # 読み取りの所有者が取り消された場合は、このキーだけ改めて読み取る
+                results.update(await self.get_or_load_many([key[0]], [key[1]], loader))
+        return {key: results[key] for key in keys}
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,185 @@
+"""プロセス全体で共有する Azure クライアントのプール。
+
+各クライアントは最初に要求されたときに一度だけ生成され、以降は同じインスタンス
+（と HTTP 接続）をすべてのプラグインで再利用します。データベースとコンテナーは
+seed_cosmosdb.py で作成済みである前提で、コントロールプレーンの呼び出しは行いません。
+"""
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ファクトリーの中から別のクライアントを取得することがあるため再入可能なロックを使う
+_lock = threading.RLock()
+_clients = {}
+
+
+def _get_or_create(name, factory):
+    if name not in _clients:
+        with _lock:
+            if name not in _clients:
+                _clients[name] = factory()
+    return _clients[name]
+
+
+def get_credential():
+    def factory():
+        from azure.identity import DefaultAzureCredential
+        return DefaultAzureCredential()
+    return _get_or_create("credential", factory)
+
+
+def get_async_credential():
+    def factory():
+        from azure.identity.aio import DefaultAzureCredential
+        return DefaultAzureCredential()
+    return _get_or_create("async_credential", factory)
+
+
+def get_openai_client():
+    def factory():
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        )
+    return _get_or_create("openai", factory)
+
+
+def get_model_cassette():
+    """MODEL_CASSETTE が設定されていれば、モデルへのリクエストを記録・再生するトランスポートを返します。"""
+    path = os.getenv("MODEL_CASSETTE")
+    if not path:
+        return None
+
+    def factory():
+        from utils.model_cassette import CassetteTransport
+        return CassetteTransport(path, os.getenv("MODEL_CASSETTE_MODE", "auto"))
+    return _get_or_create("model_cassette", factory)
+
+
+def get_model_http_client():
+    """Azure OpenAI への非同期 HTTP クライアント。エージェントと埋め込みのクライアントで接続を共有します。
+
+    MODEL_CASSETTE が設定されていれば、リクエストはカセットを経由します。
+    """
+    def factory():
+        from openai import DefaultAsyncHttpxClient
+        cassette = get_model_cassette()
+        return DefaultAsyncHttpxClient(transport=cassette) if cassette else DefaultAsyncHttpxClient()
+    return _get_or_create("model_http_client", factory)
+
+
+def get_async_openai_client():
+    def factory():
+        from openai import AsyncAzureOpenAI
+        return AsyncAzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            http_client=get_model_http_client(),
+        )
+    return _get_or_create("async_openai", factory)
+
+
+def catalog_container_name() -> str:
+    return os.getenv("COSMOS_CATALOG_CONTAINER_NAME", "room_types")
+
+
+def get_cosmos_client():
+    def factory():
+        from azure.cosmos import CosmosClient
+        return CosmosClient(os.getenv("COSMOS_ENDPOINT"), credential=get_credential())
+    return _get_or_create("cosmos", factory)
+
+
+def get_cosmos_container():
+    def factory():
+        return get_cosmos_client().get_database_client(os.getenv("COSMOS_DB_NAME")).get_container_client(
+            os.getenv("COSMOS_CONTAINER_NAME")
+        )
+    return _get_or_create("cosmos_container", factory)
+
+
+def get_cosmos_catalog_container():
+    def factory():
+        return get_cosmos_client().get_database_client(os.getenv("COSMOS_DB_NAME")).get_container_client(
+            catalog_container_name()
+        )
+    return _get_or_create("cosmos_catalog_container", factory)
+
+
+def get_async_cosmos_client():
+    def factory():
+        from azure.cosmos.aio import CosmosClient
+        return CosmosClient(os.getenv("COSMOS_ENDPOINT"), credential=get_async_credential())
+    return _get_or_create("async_cosmos", factory)
+
+
+def get_async_cosmos_container():
+    def factory():
+        return get_async_cosmos_client().get_database_client(os.getenv("COSMOS_DB_NAME")).get_container_client(
+            os.getenv("COSMOS_CONTAINER_NAME")
+        )
+    return _get_or_create("async_cosmos_container", factory)
+
+
+def get_async_cosmos_catalog_container():
+    def factory():
+        return get_async_cosmos_client().get_database_client(os.getenv("COSMOS_DB_NAME")).get_container_client(
+            catalog_container_name()
+        )
+    return _get_or_create("async_cosmos_catalog_container", factory)
+
+
+def get_embedding_cache():
+    """EMBEDDING_CACHE_DIR の永続埋め込みキャッシュを返します。空文字を指定すると無効（None）になります。"""
+    def factory():
+        directory = os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache")
+        if not directory:
+            return None
+        from utils.embedding_cache import EmbeddingCache
+        return EmbeddingCache(directory)
+    return _get_or_create("embedding_cache", factory)
+
+
+def get_room_store():
+    """ROOM_STORE 環境変数で選択された在庫ストアの共有インスタンスを返します。"""
+    def factory():
+        backend = os.getenv("ROOM_STORE", "cosmos")
+        if backend == "memory":
+            from utils.room_store import InMemoryRoomStore
+            return InMemoryRoomStore()
+        if backend == "sqlite":
+            from utils.room_store import SQLiteRoomStore
+            return SQLiteRoomStore(os.getenv("ROOM_STORE_SQLITE_PATH", "rooms.sqlite3"))
+        if backend == "cosmos":
+            from utils.cosmosdb_client_aio import AsyncCosmosDBClient
+            store = AsyncCosmosDBClient()
+            if os.getenv("VECTOR_SEARCH_BACKEND", "cosmos") == "local":
+                from utils.vector_index import IndexedRoomStore
+                return IndexedRoomStore(
+                    store,
+                    quantization=os.getenv("VECTOR_INDEX_QUANTIZATION", "none"),
+                    refresh_seconds=float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "60")),
+                )
+            return store
+        raise ValueError(f"不明な ROOM_STORE です: {backend}")
+    return _get_or_create("room_store", factory)
+
+
+async def close_async_clients():
+    """非同期クライアントの接続を閉じます。プロセス終了時に一度だけ呼び出してください。"""
+    with _lock:
+        closing = [_clients.pop(name, None) for name in ("async_cosmos", "async_openai", "async_credential")]
+        # エージェントのクライアントとも共有するため、async_openai とは別に閉じる（閉じ済みなら何もしない）
+        http_client = _clients.pop("model_http_client", None)
+        _clients.pop("async_cosmos_container", None)
+        _clients.pop("async_cosmos_catalog_container", None)
+    for client in closing:
+        if client is not None:
+            await client.close()
+    if http_client is not None:
+        await http_client.aclose()
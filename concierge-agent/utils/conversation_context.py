@@ -0,0 +1,180 @@
+"""長い会話のコンテキスト管理。
+
+Responses API のスレッドは previous_response_id で会話全体を連結するため、ターンを重ねるごとに
+入力トークンが増え続けます。ConversationContext はセッションの会話をコンパクトな形でローカルに保持し、
+スレッドに送った会話の推定トークン数が予算を超えたら新しいスレッドに切り替えます。
+新しいスレッドには、古いターンの要約（instructions に追加）と直近のターンだけを引き継ぎ、
+使用済みの大きなツール結果は引き継ぎません。
+
+    CONTEXT_MAX_TOKENS=8000             # 1 スレッドで送る会話の推定トークン数の上限
+    CONTEXT_WINDOW_TURNS=4              # スレッドを切り替えるときに引き継ぐ直近のターン数
+    CONTEXT_SUMMARIZE=true              # 古いターンを要約する（false の場合は破棄）
+    CONTEXT_MAX_TOOL_RESULT_CHARS=1000  # これより大きいツール結果は引き継がない
+"""
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from semantic_kernel.contents import ChatMessageContent, FunctionCallContent, FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+SUMMARY_INSTRUCTIONS = """
+あなたはホテルのコンシェルジュとゲストの会話を要約します。
+これまでの要約と新しい会話をまとめ、以降の対応に必要な情報（ゲストの希望、確認した空室状況、
+予約の内容と状態、未解決の依頼）を箇条書きで簡潔に残してください。
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算。ASCII は 4 文字で 1 トークン、それ以外（日本語など）は 1 文字 1 トークンとみなします。"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+@dataclass
+class ContextPolicy:
+    max_tokens: int = 8000
+    window_turns: int = 4
+    summarize: bool = True
+    max_tool_result_chars: int = 1000
+    summary_max_tokens: int = 500
+
+    @classmethod
+    def from_env(cls) -> "ContextPolicy":
+        return cls(
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "8000")),
+            window_turns=int(os.getenv("CONTEXT_WINDOW_TURNS", "4")),
+            summarize=os.getenv("CONTEXT_SUMMARIZE", "true").lower() == "true",
+            max_tool_result_chars=int(os.getenv("CONTEXT_MAX_TOOL_RESULT_CHARS", "1000")),
+        )
+
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+    tool_notes: list[str] = field(default_factory=list)
+
+    @property
+    def compact_text(self) -> str:
+        """次のスレッドに引き継ぐアシスタント側のテキスト（小さいツール結果の要点を含む）。"""
+        return "\n".join([*self.tool_notes, self.assistant]) if self.tool_notes else self.assistant
+
+    @property
+    def compact_tokens(self) -> int:
+        return estimate_tokens(self.user) + estimate_tokens(self.compact_text)
+
+
+class ConversationContext:
+    """1 セッション分の会話を、トークン予算に収まるように管理します。"""
+
+    def __init__(self, policy: Optional[ContextPolicy] = None, client=None, model: Optional[str] = None,
+                 instructions: str = ""):
+        self.policy = policy or ContextPolicy.from_env()
+        self.client = client
+        self.model = model
+        self.instructions = instructions
+        self.summary = ""
+        self.turns: deque[Turn] = deque()
+        self.thread_tokens = 0
+        self.rotations = 0
+        self._carry: list[Turn] = []
+
+    @classmethod
+    def for_agent(cls, agent, policy: Optional[ContextPolicy] = None) -> "ConversationContext":
+        return cls(policy, client=agent.client, model=agent.ai_model_id, instructions=agent.instructions or "")
+
+    def prepare(self, user_input: str) -> dict:
+        """invoke / invoke_stream に渡す messages と instructions_override を返します。
+
+        引き継いだターンはターンが成功して record_turn されるまで保持するため、失敗したターンは再試行できます。
+        """
+        messages = []
+        for turn in self._carry:
+            messages.append(ChatMessageContent(role=AuthorRole.USER, content=turn.user))
+            messages.append(ChatMessageContent(role=AuthorRole.ASSISTANT, content=turn.compact_text))
+
+        kwargs = {"messages": [*messages, user_input] if messages else user_input}
+        if self.summary:
+            kwargs["instructions_override"] = f"{self.instructions}\n\n# これまでの会話の要約\n{self.summary}"
+        return kwargs
+
+    def record_turn(self, user_input: str, messages: list[ChatMessageContent], response_text: str):
+        """ターンの内容を記録し、スレッドに送った会話の推定トークン数を更新します。"""
+        tokens = estimate_tokens(user_input) + estimate_tokens(response_text)
+        notes, observed = [], 0
+        for message in messages:
+            usage = (message.metadata or {}).get("usage") or {}
+            observed = max(observed, usage.get("input_tokens") or 0)
+            for item in message.items:
+                if isinstance(item, FunctionCallContent):
+                    tokens += estimate_tokens(str(item.arguments or ""))
+                elif isinstance(item, FunctionResultContent):
+                    result = str(item.result)
+                    tokens += estimate_tokens(result)
+                    if len(result) <= self.policy.max_tool_result_chars:
+                        notes.append(f"[{item.function_name}] {result}")
+
+        self.turns.append(Turn(user_input, response_text, notes))
+        # 引き継いだターンは新しいスレッドに送信済みになった
+        self._carry = []
+        self.thread_tokens = max(self.thread_tokens + tokens, observed)
+
+    def should_rotate(self) -> bool:
+        return self.thread_tokens > self.policy.max_tokens
+
+    async def rotate(self, thread):
+        """古いターンを要約し、現在のスレッドを削除して、次のターンから新しいスレッドを使うようにします。"""
+        window = self.policy.window_turns
+        older = list(self.turns)[:-window] if window else list(self.turns)
+        recent = list(self.turns)[-window:] if window else []
+
+        if older and self.policy.summarize and self.client:
+            try:
+                self.summary = await self._summarize(older)
+            except Exception as e:
+                print(f"会話の要約に失敗しました。古いターンは破棄します: {e}")
+
+        self.turns = deque(recent)
+        self._carry = recent
+        self.thread_tokens = estimate_tokens(self.summary) + sum(turn.compact_tokens for turn in recent)
+        self.rotations += 1
+        if thread:
+            try:
+                await thread.delete()
+            except Exception as e:
+                print(f"スレッドの削除に失敗しました: {e}")
+
+    async def after_turn(self, thread, user_input: str, messages: list[ChatMessageContent], response_text: str):
+        """ターンを記録し、予算を超えた場合はスレッドを切り替えます。次のターンで使うスレッドを返します。"""
+        self.record_turn(user_input, messages, response_text)
+        if self.should_rotate():
+            await self.rotate(thread)
+            return None
+        return thread
+
+    async def abandon_turn(self, thread):
+        """失敗（または取り消し）したターンの後始末をし、次のターン（再試行）で使うスレッドを返します。
+
+        引き継いだターンを送ったあとに失敗した場合、新しいスレッドには引き継いだ会話が既に入っているため、
+        再試行で二重に送らないようにそのスレッドを削除し、再試行では改めて新しいスレッドに引き継ぎます。
+        """
+        if not self._carry or thread is None:
+            return thread
+        try:
+            await thread.delete()
+        except Exception as e:
+            print(f"スレッドの削除に失敗しました: {e}")
+        return None
+
+    async def _summarize(self, turns: list[Turn]) -> str:
+        transcript = "\n".join(f"ゲスト: {turn.user}\nコンシェルジュ: {turn.compact_text}" for turn in turns)
+        response = await self.client.responses.create(
+            model=self.model,
+            instructions=SUMMARY_INSTRUCTIONS,
+            input=f"これまでの要約:\n{self.summary or '（なし）'}\n\n新しい会話:\n{transcript}",
+            max_output_tokens=self.policy.summary_max_tokens,
+            store=False,
+        )
+        return response.output_text.strip()
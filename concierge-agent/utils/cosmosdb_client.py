@@ -1,62 +1,104 @@
 import os
-from dotenv import load_dotenv
-from openai import AzureOpenAI 
-from azure.cosmos import CosmosClient, PartitionKey
-from azure.identity import DefaultAzureCredential
-
-load_dotenv()
-
-credential = DefaultAzureCredential()
-
-client = AzureOpenAI(
-  api_key = os.getenv("AZURE_OPENAI_API_KEY"),  
-  api_version = os.getenv("AZURE_OPENAI_API_VERSION"),
-  azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-)
+from azure.cosmos import exceptions
+from utils.client_pool import get_cosmos_catalog_container, get_cosmos_container, get_embedding_cache, get_openai_client
+from utils.embeddings import cache_model_key, configured_dimensions, storage_vector
+from utils.room_store import inventory_doc
 
 def generate_embeddings(text):
-    return client.embeddings.create(
-        input = [text], 
-        model=os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT")).data[0].embedding
+    options = {"dimensions": configured_dimensions()} if configured_dimensions() else {}
+    cache = get_embedding_cache()
+    vector = cache.get(cache_model_key(), text) if cache else None
+    if vector is None:
+        vector = get_openai_client().embeddings.create(
+            input = [text], 
+            model=os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT"),
+            **options).data[0].embedding
+        if cache:
+            cache.put(cache_model_key(), text, vector)
+    return vector
 
 class CosmosDBClient:
     def __init__(self):
-        endpoint = os.getenv("COSMOS_ENDPOINT")
-        key = os.getenv("COSMOS_KEY")
-        db_name = os.getenv("COSMOS_DB_NAME")
-        container_name = os.getenv("COSMOS_CONTAINER_NAME")
-
-        self.client = CosmosClient(endpoint, credential=credential)
-        self.database = self.client.create_database_if_not_exists(db_name)
-        self.container = self.database.create_container_if_not_exists(
-            id=container_name,
-            partition_key=PartitionKey(path="/roomType"),
-            offer_throughput=400
-        )
+        # カタログに書き込み済みの説明文（客室タイプごと）。日付ごとに埋め込み・upsert し直さないために使う
+        self._catalog_descriptions = {}
+
+    @property
+    def container(self):
+        return get_cosmos_container()
 
     def get_room_availability(self, room_type: str, date: str):
-        query = f"SELECT * FROM rooms r WHERE r.roomType = '{room_type}' AND r.date = '{date}'"
-        items = list(self.container.query_items(query=query, enable_cross_partition_query=True))
+        # insert_room_record が書き込む決定的な id でポイント読み取り（1 RU）
+        try:
+            return self.container.read_item(item=f"{room_type}_{date}", partition_key=room_type)
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+
+        # ランダムな id で登録された旧形式のドキュメントはパーティション内のクエリで検索
+        query = "SELECT * FROM rooms r WHERE r.roomType = @room_type AND r.date = @date"
+        items = list(self.container.query_items(
+            query=query,
+            parameters=[
+                {"name": "@room_type", "value": room_type},
+                {"name": "@date", "value": date},
+            ],
+            partition_key=room_type,
+        ))
         return items[0] if items else None
 
     def update_room_count(self, room_type: str, date: str, count: int):
-        doc = self.get_room_availability(room_type, date)
-        if doc:
-            doc["available"] = max(0, doc["available"] - count)
-            self.container.upsert_item(doc)
-            return doc
-        return None
-
-    def insert_room_record(self, room_type: str, date: str, available: int, price: str, description: str):
-        doc_id = f"{room_type}_{date}"
-        vector = generate_embeddings(description)
-
-        self.container.upsert_item({
-            "id": doc_id,
-            "roomType": room_type,
-            "date": date,
-            "available": available,
-            "price": price,
-            "description": description,
-            "vectorDescription": vector
-        })
\ No newline at end of file
+        """空室数を条件付きでアトミックに減らし、更新後のドキュメントを返します。
+
+        空室数が足りない場合やレコードが存在しない場合は None を返します。
+        """
+        if count < 1:
+            raise ValueError(f"予約する客室数は 1 以上で指定してください: {count}")
+        try:
+            return self._decrement_available(f"{room_type}_{date}", room_type, count)
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+
+        # ランダムな id で登録された旧形式のドキュメントは id を解決してから更新
+        query = "SELECT VALUE r.id FROM rooms r WHERE r.roomType = @room_type AND r.date = @date"
+        ids = list(self.container.query_items(
+            query=query,
+            parameters=[
+                {"name": "@room_type", "value": room_type},
+                {"name": "@date", "value": date},
+            ],
+            partition_key=room_type,
+        ))
+        if not ids:
+            return None
+        try:
+            return self._decrement_available(ids[0], room_type, count)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def _decrement_available(self, doc_id: str, room_type: str, count: int):
+        # 部分更新 (patch) とフィルター述語で「残数確認 + 減算」を 1 回の往復で行う
+        try:
+            return self.container.patch_item(
+                item=doc_id,
+                partition_key=room_type,
+                patch_operations=[{"op": "incr", "path": "/available", "value": -count}],
+                filter_predicate=f"FROM rooms r WHERE r.available >= {int(count)}",
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            return None
+
+    @property
+    def catalog_container(self):
+        return get_cosmos_catalog_container()
+
+    def insert_room_record(self, room_type: str, date: str, available: int, price: str, description: str = None):
+        # 説明文と埋め込みは客室タイプのカタログに 1 件だけ保持し、在庫ドキュメントには含めない
+        if description is not None and self._catalog_descriptions.get(room_type) != description:
+            self.catalog_container.upsert_item({
+                "id": room_type,
+                "roomType": room_type,
+                "description": description,
+                "vectorDescription": storage_vector(generate_embeddings(description))
+            })
+            self._catalog_descriptions[room_type] = description
+
+        self.container.upsert_item(inventory_doc(room_type, date, available, price))
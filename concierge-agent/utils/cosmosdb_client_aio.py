@@ -0,0 +1,184 @@
+import asyncio
+from typing import Optional
+from azure.cosmos import exceptions
+from utils.client_pool import get_async_cosmos_catalog_container, get_async_cosmos_container
+from utils.embeddings import embed_document, storage_vector
+from utils.room_store import CatalogSearchMixin, inventory_doc
+
+class AsyncCosmosDBClient(CatalogSearchMixin):
+    """CosmosDBClient の非同期版。イベントループをブロックせずに Cosmos DB にアクセスします。
+
+    日付ごとの在庫コンテナーと、説明文・埋め込みを保持する客室タイプのカタログコンテナーを扱います。
+    コンテナーを渡さない場合は、client_pool の共有クライアントから最初の利用時に解決されます。
+    """
+
+    def __init__(self, container=None, catalog_container=None):
+        self._container = container
+        self._catalog_container = catalog_container
+        self._catalog_descriptions = {}
+
+    @property
+    def container(self):
+        return self._container or get_async_cosmos_container()
+
+    @property
+    def catalog_container(self):
+        return self._catalog_container or get_async_cosmos_catalog_container()
+
+    async def get_room_availability(self, room_type: str, date: str):
+        # insert_room_record が書き込む決定的な id でポイント読み取り（1 RU）
+        try:
+            return await self.container.read_item(item=f"{room_type}_{date}", partition_key=room_type)
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+
+        # ランダムな id で登録された旧形式のドキュメントはパーティション内のクエリで検索
+        query = "SELECT * FROM rooms r WHERE r.roomType = @room_type AND r.date = @date"
+        items = [item async for item in self.container.query_items(
+            query=query,
+            parameters=[
+                {"name": "@room_type", "value": room_type},
+                {"name": "@date", "value": date},
+            ],
+            partition_key=room_type,
+        )]
+        return items[0] if items else None
+
+    async def get_availability_range(self, room_types: list[str], date_from: str, date_to: str):
+        """複数の客室タイプ・日付範囲の在庫を、客室タイプ（パーティション）ごとのクエリを並行して読み取ります。"""
+        query = (
+            "SELECT r.roomType, r.date, r.available, r.price FROM rooms r "
+            "WHERE r.date >= @date_from AND r.date <= @date_to"
+        )
+        parameters = [
+            {"name": "@date_from", "value": date_from},
+            {"name": "@date_to", "value": date_to},
+        ]
+
+        async def read(room_type: str):
+            return [item async for item in self.container.query_items(
+                query=query, parameters=parameters, partition_key=room_type,
+            )]
+
+        results = await asyncio.gather(*(read(room_type) for room_type in room_types))
+        return [item for items in results for item in items]
+
+    async def update_room_count(self, room_type: str, date: str, count: int):
+        """空室数を条件付きでアトミックに減らし、更新後のドキュメントを返します。
+
+        空室数が足りない場合やレコードが存在しない場合は None を返します。
+        """
+        if count < 1:
+            raise ValueError(f"予約する客室数は 1 以上で指定してください: {count}")
+        try:
+            return await self._decrement_available(f"{room_type}_{date}", room_type, count)
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+
+        # ランダムな id で登録された旧形式のドキュメントは id を解決してから更新
+        query = "SELECT VALUE r.id FROM rooms r WHERE r.roomType = @room_type AND r.date = @date"
+        ids = [item async for item in self.container.query_items(
+            query=query,
+            parameters=[
+                {"name": "@room_type", "value": room_type},
+                {"name": "@date", "value": date},
+            ],
+            partition_key=room_type,
+        )]
+        if not ids:
+            return None
+        try:
+            return await self._decrement_available(ids[0], room_type, count)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    async def _decrement_available(self, doc_id: str, room_type: str, count: int):
+        # 部分更新 (patch) とフィルター述語で「残数確認 + 減算」を 1 回の往復で行う
+        try:
+            return await self.container.patch_item(
+                item=doc_id,
+                partition_key=room_type,
+                patch_operations=[{"op": "incr", "path": "/available", "value": -count}],
+                filter_predicate=f"FROM rooms r WHERE r.available >= {int(count)}",
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            return None
+
+    async def upsert_room_type(self, room_type: str, description: str, vector: Optional[list[float]] = None):
+        if vector is None:
+            vector = await embed_document(description)
+
+        await self.catalog_container.upsert_item({
+            "id": room_type,
+            "roomType": room_type,
+            "description": description,
+            "vectorDescription": storage_vector(vector)
+        })
+        self._catalog_descriptions[room_type] = description
+
+    async def insert_room_record(self, room_type: str, date: str, available: int, price: str,
+                                 description: Optional[str] = None, vector: Optional[list[float]] = None):
+        # 説明文はカタログに 1 回だけ書き込み、在庫ドキュメントには含めない
+        if description is not None and self._catalog_descriptions.get(room_type) != description:
+            await self.upsert_room_type(room_type, description, vector)
+
+        await self.container.upsert_item(inventory_doc(room_type, date, available, price))
+
+    async def search_room_types(self, embedding: list[float], top_n: int):
+        sql_query = """
+        SELECT TOP @top_n c.roomType, c.description
+        FROM c
+        ORDER BY VectorDistance(c.vectorDescription, @embedding)
+        """
+
+        results = self.catalog_container.query_items(
+            query=sql_query,
+            parameters=[
+                {"name": "@top_n", "value": top_n},
+                {"name": "@embedding", "value": storage_vector(embedding)}
+            ]
+        )
+        return [item async for item in results]
+
+    async def join_inventory(self, room_types: list[dict], top_k: int, date_from: Optional[str] = None,
+                             date_to: Optional[str] = None, min_available: int = 0, max_price: Optional[float] = None):
+        """客室タイプごとに、条件を満たす最も早い日付の在庫をパーティション内のクエリで取得して結合します。
+
+        max_price は priceAmount（数値の料金）で比較するため、priceAmount のない旧形式のドキュメントは除外されます。
+        """
+        clauses = ["r.available >= @min_available"]
+        parameters = [{"name": "@min_available", "value": min_available}]
+        if date_from:
+            clauses.append("r.date >= @date_from")
+            parameters.append({"name": "@date_from", "value": date_from})
+        if date_to:
+            clauses.append("r.date <= @date_to")
+            parameters.append({"name": "@date_to", "value": date_to})
+        if max_price is not None:
+            clauses.append("r.priceAmount <= @max_price")
+            parameters.append({"name": "@max_price", "value": max_price})
+
+        sql_query = f"""
+        SELECT TOP 1 r.date, r.available, r.price
+        FROM rooms r
+        WHERE {" AND ".join(clauses)}
+        ORDER BY r.date
+        """
+
+        async def first_match(room_type):
+            items = [item async for item in self.container.query_items(
+                query=sql_query, parameters=parameters, partition_key=room_type["roomType"]
+            )]
+            if not items:
+                return None
+            return {"roomType": room_type["roomType"], "description": room_type["description"], **items[0]}
+
+        # 類似度の高い順に top_k タイプずつ並列に問い合わせ、必要な件数がそろったら打ち切る
+        results = []
+        for start in range(0, len(room_types), top_k):
+            chunk = room_types[start:start + top_k]
+            matches = await asyncio.gather(*(first_match(room_type) for room_type in chunk))
+            results.extend(match for match in matches if match)
+            if len(results) >= top_k:
+                break
+        return results[:top_k]
@@ -0,0 +1,106 @@
+"""コンテンツアドレス方式の永続埋め込みキャッシュ。
+
+キーは hash(モデル名, テキスト) で、次元数ごとに 2 つのファイルに保存します:
+
+- {dimensions}.vec: float32 ベクトルを行として連結したバイナリ（読み取りはメモリマップ）
+- {dimensions}.idx: 32 バイトのダイジェストと 8 バイトの行番号のレコード列
+
+書き込みは追記のみで、書き込み途中で中断した末尾の不完全な行は次回オープン時に切り捨てます。
+同じディレクトリに書き込むプロセスは 1 つに限定してください。
+"""
+import hashlib
+import os
+import struct
+import threading
+
+import numpy as np
+
+_INDEX_RECORD = struct.Struct("<32sQ")
+
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+class _Shard:
+    """同じ次元数のベクトルを保持するファイルの組。"""
+
+    def __init__(self, directory: str, dimensions: int):
+        self.dimensions = dimensions
+        self.row_bytes = dimensions * 4
+        self.vec_path = os.path.join(directory, f"{dimensions}.vec")
+        self.idx_path = os.path.join(directory, f"{dimensions}.idx")
+        self.rows = {}
+        self._mmap = None
+
+        if os.path.exists(self.vec_path):
+            size = os.path.getsize(self.vec_path)
+            if size % self.row_bytes:
+                with open(self.vec_path, "r+b") as file:
+                    file.truncate(size - size % self.row_bytes)
+        row_count = self._row_count()
+        if os.path.exists(self.idx_path):
+            with open(self.idx_path, "rb") as file:
+                data = file.read()
+            usable = len(data) - len(data) % _INDEX_RECORD.size
+            for digest, row in _INDEX_RECORD.iter_unpack(data[:usable]):
+                if row < row_count:
+                    self.rows[digest] = row
+
+    def _row_count(self) -> int:
+        return os.path.getsize(self.vec_path) // self.row_bytes if os.path.exists(self.vec_path) else 0
+
+    def read(self, row: int) -> list[float]:
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            self._mmap = np.memmap(self.vec_path, dtype=np.float32, mode="r").reshape(-1, self.dimensions)
+        return self._mmap[row].tolist()
+
+    def append(self, digest: bytes, vector: list[float]):
+        row = self._row_count()
+        with open(self.vec_path, "ab") as file:
+            file.write(np.asarray(vector, dtype=np.float32).tobytes())
+        # ベクトル本体を書き終えてからインデックスを追記する
+        with open(self.idx_path, "ab") as file:
+            file.write(_INDEX_RECORD.pack(digest, row))
+        self.rows[digest] = row
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._shards = {}
+        self._lock = threading.Lock()
+        for name in os.listdir(directory):
+            stem, ext = os.path.splitext(name)
+            if ext == ".vec" and stem.isdigit():
+                self._shards[int(stem)] = _Shard(directory, int(stem))
+
+    def get(self, model: str, text: str):
+        digest = cache_key(model, text)
+        with self._lock:
+            for shard in self._shards.values():
+                row = shard.rows.get(digest)
+                if row is not None:
+                    self.hits += 1
+                    return shard.read(row)
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, vector: list[float]):
+        digest = cache_key(model, text)
+        with self._lock:
+            shard = self._shards.get(len(vector))
+            if shard is None:
+                shard = self._shards[len(vector)] = _Shard(self.directory, len(vector))
+            if digest not in shard.rows:
+                shard.append(digest, vector)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": sum(len(shard.rows) for shard in self._shards.values()),
+        }
@@ -0,0 +1,119 @@
+"""埋め込みベクトルの生成。
+
+EMBEDDINGS_BACKEND=hash を指定すると、ネットワークを使わない決定的なハッシュ埋め込みを使用します。
+ローカルのルームストアと組み合わせて、Azure に接続できない環境での負荷試験に使います。
+
+AZURE_OPENAI_EMBEDDINGS_DIMENSIONS を指定すると、text-embedding-3 系モデルの短縮された次元数で
+埋め込みを要求します。VECTOR_DATA_TYPE=int8 の場合、Cosmos DB に保存・照会するベクトルは
+storage_vector で int8 に量子化します。
+"""
+import hashlib
+import math
+import os
+import unicodedata
+from typing import Optional
+
+from utils.client_pool import get_async_openai_client, get_embedding_cache
+
+DEFAULT_DIMENSIONS = 1536
+
+
+def configured_dimensions() -> Optional[int]:
+    """明示的に設定された埋め込みの次元数を返します。未設定の場合はモデルの既定値を使うため None です。"""
+    value = os.getenv("AZURE_OPENAI_EMBEDDINGS_DIMENSIONS")
+    return int(value) if value else None
+
+
+def embedding_dimensions() -> int:
+    return configured_dimensions() or DEFAULT_DIMENSIONS
+
+
+def cache_model_key(dimensions: Optional[int] = None) -> str:
+    """永続埋め込みキャッシュのキーに使うモデル名。次元数が異なる埋め込みを区別します。"""
+    dimensions = dimensions or configured_dimensions()
+    model = os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT")
+    return f"{model}:{dimensions}" if dimensions else model
+
+
+def quantize_int8(vector: list[float]) -> list[int]:
+    """ベクトルごとのスケールで [-127, 127] の整数に量子化します。コサイン距離はスケールに依存しません。"""
+    scale = max((abs(v) for v in vector), default=0.0) or 1.0
+    return [round(v / scale * 127) for v in vector]
+
+
+def storage_vector(vector: list[float]) -> list:
+    """VECTOR_DATA_TYPE に合わせて、Cosmos DB に保存・照会する形式のベクトルを返します。"""
+    if os.getenv("VECTOR_DATA_TYPE", "float32") == "int8":
+        return quantize_int8(vector)
+    return vector
+
+
+def hash_embedding(text: str, dimensions: Optional[int] = None) -> list[float]:
+    """文字 bigram の特徴ハッシュによる L2 正規化済みベクトルを返します。"""
+    dimensions = dimensions or embedding_dimensions()
+    text = unicodedata.normalize("NFKC", text).lower()
+    vector = [0.0] * dimensions
+    grams = [text[i:i + 2] for i in range(max(len(text) - 1, 1))]
+    for gram in grams:
+        digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+async def embed_text(text: str) -> list[float]:
+    """検索クエリを埋め込みます。ユーザー入力は永続埋め込みキャッシュに保存しません。"""
+    if os.getenv("EMBEDDINGS_BACKEND", "azure") == "hash":
+        return hash_embedding(text)
+    return (await _create_embeddings([text], batch_size=1))[0]
+
+
+async def _create_embeddings(texts: list[str], batch_size: int, dimensions: Optional[int] = None) -> list[list[float]]:
+    options = {}
+    dimensions = dimensions or configured_dimensions()
+    if dimensions:
+        options["dimensions"] = dimensions
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        response = await get_async_openai_client().embeddings.create(
+            input=texts[start:start + batch_size],
+            model=os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT"),
+            **options,
+        )
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+
+async def embed_queries(texts: list[str], batch_size: int = 16) -> list[list[float]]:
+    """複数の検索クエリをまとめて埋め込みます（クエリキャッシュのウォームアップ用）。"""
+    if os.getenv("EMBEDDINGS_BACKEND", "azure") == "hash":
+        return [hash_embedding(text) for text in texts]
+    return await _create_embeddings(texts, batch_size)
+
+
+async def embed_texts(texts: list[str], batch_size: int = 16, dimensions: Optional[int] = None) -> list[list[float]]:
+    """客室説明などの文書を埋め込みます。
+
+    永続埋め込みキャッシュにないテキストだけを、batch_size 件ずつまとめたリクエストで変換します。
+    dimensions を省略した場合は AZURE_OPENAI_EMBEDDINGS_DIMENSIONS（未設定ならモデルの既定値）を使います。
+    """
+    if os.getenv("EMBEDDINGS_BACKEND", "azure") == "hash":
+        return [hash_embedding(text, dimensions) for text in texts]
+
+    model = cache_model_key(dimensions)
+    cache = get_embedding_cache()
+    vectors = [cache.get(model, text) if cache else None for text in texts]
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+
+    computed = dict(zip(missing, await _create_embeddings(missing, batch_size, dimensions)))
+    if cache:
+        for text, vector in computed.items():
+            cache.put(model, text, vector)
+
+    return [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+
+
+async def embed_document(text: str) -> list[float]:
+    return (await embed_texts([text]))[0]
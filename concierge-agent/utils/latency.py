@@ -0,0 +1,20 @@
+"""レイテンシの集計ヘルパー。"""
+from typing import Iterable, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    """最近傍法によるパーセンタイル（q は 0〜1）。値がない場合は None を返します。"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(values: Iterable[float]) -> dict:
+    values = list(values)
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+    }
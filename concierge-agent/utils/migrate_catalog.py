@@ -0,0 +1,100 @@
+"""既存の在庫コンテナーを「客室タイプのカタログ + 軽量な在庫ドキュメント」の形式に移行するツール。
+
+concierge-agent ディレクトリで実行します:
+
+    python -m utils.migrate_catalog --dry-run
+    python -m utils.migrate_catalog
+
+- 各客室タイプの説明文と埋め込みをカタログコンテナーに 1 件だけ書き込みます
+  （既存の vectorDescription を再利用するため、埋め込みの再計算は行いません）
+- 在庫ドキュメントを roomType / date / available / price / priceAmount だけの形式に置き換えます
+- ランダムな id の旧形式ドキュメントは {roomType}_{date} の id で書き直してから削除します
+  （同じ客室タイプ・日付のドキュメントが複数ある場合は最も新しいものを残します）
+"""
+import argparse
+import asyncio
+import json
+import os
+from azure.cosmos.aio import CosmosClient
+from dotenv import load_dotenv
+
+from utils.client_pool import close_async_clients
+from utils.cosmosdb_client_aio import AsyncCosmosDBClient
+from utils.embeddings import embed_texts
+from utils.room_store import inventory_doc
+from utils.seed_cosmosdb import get_or_create_containers
+
+load_dotenv()
+
+
+async def migrate(args):
+    cosmos_client = CosmosClient(os.getenv("COSMOS_ENDPOINT"), os.getenv("COSMOS_KEY"))
+    try:
+        container, catalog = await get_or_create_containers(cosmos_client)
+        docs = [doc async for doc in container.query_items(query="SELECT * FROM rooms r")]
+
+        # 客室タイプ・日付ごとに最も新しいドキュメントを残す
+        latest = {}
+        for doc in docs:
+            key = (doc["roomType"], doc["date"])
+            if key not in latest or doc["_ts"] > latest[key]["_ts"]:
+                latest[key] = doc
+
+        room_types = {}
+        for doc in sorted(docs, key=lambda doc: doc["_ts"], reverse=True):
+            if doc.get("description") and doc["roomType"] not in room_types:
+                room_types[doc["roomType"]] = doc
+
+        missing = [doc["description"] for doc in room_types.values() if not doc.get("vectorDescription")]
+        vectors = dict(zip(missing, await embed_texts(missing))) if missing else {}
+
+        before = sum(len(json.dumps(doc, ensure_ascii=False)) for doc in docs)
+        slim_docs = [
+            inventory_doc(doc["roomType"], doc["date"], doc["available"], doc["price"]) for doc in latest.values()
+        ]
+        after = sum(len(json.dumps(doc, ensure_ascii=False)) for doc in slim_docs)
+        stale = [doc for doc in docs if doc["id"] != f"{doc['roomType']}_{doc['date']}"]
+
+        print(f"在庫ドキュメント: {len(docs)} 件 → {len(slim_docs)} 件（削除する旧形式 id: {len(stale)} 件）")
+        print(f"カタログに登録する客室タイプ: {len(room_types)} 件")
+        if before:
+            print(f"在庫ドキュメントの合計サイズ: {before:,} → {after:,} バイト（{1 - after / before:.1%} 削減）")
+        if args.dry_run:
+            return
+
+        # シードや非同期クライアントと同じく、VECTOR_DATA_TYPE に合わせた形式（storage_vector）で書き込む
+        store = AsyncCosmosDBClient(container, catalog)
+        for room_type, doc in room_types.items():
+            await store.upsert_room_type(
+                room_type, doc["description"], vector=doc.get("vectorDescription") or vectors[doc["description"]]
+            )
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(operation):
+            async with semaphore:
+                await operation
+
+        await asyncio.gather(*(bounded(container.upsert_item(doc)) for doc in slim_docs))
+        await asyncio.gather(*(
+            bounded(container.delete_item(item=doc["id"], partition_key=doc["roomType"])) for doc in stale
+        ))
+        print("移行が完了しました。")
+    finally:
+        await cosmos_client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="在庫コンテナーを客室タイプのカタログ形式に移行します。")
+    parser.add_argument("--dry-run", action="store_true", help="変更を書き込まずに移行内容だけを表示する")
+    parser.add_argument("--concurrency", type=int, default=32, help="同時書き込み数の上限")
+    args = parser.parse_args()
+
+    try:
+        await migrate(args)
+    finally:
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""Azure OpenAI へのリクエストと応答を記録・再生するカセット。
+
+AsyncAzureOpenAI の HTTP トランスポートとして差し込み、リクエスト（メソッド・パス・クエリ・JSON 本文）の
+ハッシュをキーに、応答をローカルの JSONL ファイル（カセット）に保存します。再生モードではネットワークに
+接続せずにカセットから応答を返すため、評価データセットの再生成やエージェントの回帰テストを決定的に
+オフラインで実行できます。エンドポイントと認証ヘッダーはキーに含めません。
+
+    MODEL_CASSETTE=model_cassette.jsonl  # カセットファイル（未設定なら無効）
+    MODEL_CASSETTE_MODE=auto             # record: すべて記録し直す / replay: 再生のみ / auto: ないものだけ記録
+
+再生モードでカセットにないリクエストは 400 エラーとして返し（SDK は再試行しません）、report() で一覧を表示します。
+ツールの結果が日付など実行のたびに変わる値を含むと、そのターン以降のリクエストはキーが変わります。
+"""
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+
+from openai import DefaultAsyncHttpxClient
+
+# openai SDK が使う HTTP ライブラリ（SDK のバージョンによって httpx または httpx2）
+httpx = sys.modules[DefaultAsyncHttpxClient.__mro__[1].__module__.partition(".")[0]]
+
+MODES = ("record", "replay", "auto")
+
+
+def request_key(request) -> str:
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        body = body.decode("utf-8", errors="replace")
+    query = sorted(request.url.params.multi_items())
+    payload = json.dumps([request.method, request.url.path, query, body], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def describe(request) -> str:
+    """カセットにないリクエストを見分けるための短い説明（最後の入力の先頭）。"""
+    try:
+        body = json.loads(request.content)
+    except ValueError:
+        return request.url.path
+    items = body.get("input")
+    if isinstance(items, list) and items:
+        items = items[-1]
+    return f"{request.url.path} {json.dumps(items, ensure_ascii=False)[:120]}"
+
+
+@dataclass
+class CassetteStats:
+    hits: int = 0
+    recorded: int = 0
+    misses: dict[str, str] = field(default_factory=dict)
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """リクエストのハッシュをキーに、応答をカセットから返すか、実際に送信して記録する httpx トランスポート。"""
+
+    def __init__(self, path: str, mode: str = "auto", transport=None):
+        if mode not in MODES:
+            raise ValueError(f"不明な MODEL_CASSETTE_MODE です: {mode}")
+        self.path = path
+        self.mode = mode
+        self.stats = CassetteStats()
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._entries: dict[str, dict] = {}
+        if mode == "record":
+            open(path, "w", encoding="utf-8").close()
+        elif os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 書き込み途中で中断された行は無視する
+                    self._entries.setdefault(entry["key"], entry)
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        key = request_key(request)
+
+        entry = self._entries.get(key) if self.mode != "record" else None
+        if entry is not None:
+            self.stats.hits += 1
+            return httpx.Response(
+                entry["status"],
+                headers={"content-type": entry["content_type"]},
+                content=entry["body"].encode("utf-8"),
+                request=request,
+            )
+
+        if self.mode == "replay":
+            self.stats.misses.setdefault(key, describe(request))
+            return httpx.Response(
+                400,
+                json={"error": {"message": f"カセットに記録されていないリクエストです ({key[:12]})", "code": "cassette_miss"}},
+                request=request,
+            )
+
+        # 読み込み済みの本文から送信用のリクエストを作り直す（内側のトランスポートは非同期ストリームを要求する）
+        outgoing = httpx.Request(
+            request.method, request.url, headers=request.headers, content=request.content, extensions=request.extensions
+        )
+        response = await self._transport.handle_async_request(outgoing)
+        body = await response.aread()
+        await response.aclose()
+        content_type = response.headers.get("content-type", "application/json")
+        if response.status_code < 400:
+            entry = {
+                "key": key,
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "content_type": content_type,
+                "body": body.decode("utf-8"),
+            }
+            if key not in self._entries:
+                self._entries[key] = entry
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.stats.recorded += 1
+        # 展開済みの本文を返すため、content-encoding などの転送用ヘッダーは引き継がない
+        return httpx.Response(
+            response.status_code, headers={"content-type": content_type}, content=body, request=request
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def report(self):
+        print(f"モデルカセット ({self.mode}): 再生 {self.stats.hits} 件 / 記録 {self.stats.recorded} 件 "
+              f"/ 未記録 {len(self.stats.misses)} 件")
+        for key, description in self.stats.misses.items():
+            print(f"  - {key[:12]} {description}")
@@ -0,0 +1,42 @@
+"""起動直後のプリウォーム。
+
+最初のツール呼び出しで発生するコールドスタートのコスト（Entra ID トークンの取得、Cosmos DB / Azure OpenAI への
+TLS 接続、ローカルベクトルインデックスの読み込み、頻出クエリの埋め込み）を、ゲストが最初の入力を
+しているあいだにバックグラウンドで先に済ませます。失敗しても最初のツール呼び出しで改めて初期化されるだけなので、
+エラーは表示するだけで無視します。
+"""
+import asyncio
+import os
+import time
+
+from utils.client_pool import get_room_store
+
+
+async def _warm_store():
+    # 存在しないキーへのポイント読み取りで、資格情報・接続・アカウント情報の取得を済ませる
+    await get_room_store().get_room_availability("__prewarm__", "1970-01-01")
+
+
+async def _warm_openai():
+    from utils.embeddings import embed_queries
+    await embed_queries(["prewarm"])
+
+
+async def _timed(name: str, step) -> tuple[str, float]:
+    start = time.perf_counter()
+    try:
+        await step
+    except Exception as e:
+        print(f"プリウォーム {name} に失敗しました: {e}")
+    return name, time.perf_counter() - start
+
+
+async def prewarm(plugins: list = ()) -> dict[str, float]:
+    """共有クライアントと、warm_up を持つプラグインを並行して初期化し、ステップごとの所要時間（秒）を返します。"""
+    steps = {"room_store": _warm_store()}
+    if os.getenv("EMBEDDINGS_BACKEND", "azure") != "hash":
+        steps["openai"] = _warm_openai()
+    for plugin in plugins:
+        if hasattr(plugin, "warm_up"):
+            steps[type(plugin).__name__] = plugin.warm_up()
+    return dict(await asyncio.gather(*(_timed(name, step) for name, step in steps.items())))
@@ -0,0 +1,73 @@
+"""検索クエリの埋め込みをプロセス内で再利用する LRU キャッシュ。
+
+「オーシャンビュー」「ｵｰｼｬﾝﾋﾞｭｰ」「 オーシャンビュー 」のような表記ゆれを
+正規化したテキストをキーにすることで、繰り返されるクエリの埋め込み呼び出しを省きます。
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """NFKC 正規化（全角英数・半角カナの幅をそろえる）、大文字小文字の統一、空白の圧縮を行います。"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: list[float]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def get_or_embed(self, query: str, embed):
+        """正規化したクエリでキャッシュを引き、ミスした場合は embed(正規化済みクエリ) の結果を格納します。"""
+        key = normalize_query(query)
+        vector = self.get(key)
+        if vector is None:
+            vector = await embed(key)
+            self.put(key, vector)
+        return vector
+
+    async def warm_up(self, queries: list[str], embed_many):
+        """よく使われるクエリをまとめて埋め込み、キャッシュに格納します。"""
+        keys = [key for key in dict.fromkeys(normalize_query(query) for query in queries) if key]
+        keys = [key for key in keys if key not in self._entries][:self.max_size]
+        if not keys:
+            return 0
+        for key, vector in zip(keys, await embed_many(keys)):
+            self.put(key, vector)
+        return len(keys)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
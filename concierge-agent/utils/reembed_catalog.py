@@ -0,0 +1,69 @@
+"""客室タイプのカタログを、別の次元数・データ型・ベクトルインデックスで埋め込み直すツール。
+
+Cosmos DB のベクトルポリシーは作成後に変更できないため、新しいポリシーのカタログコンテナーを
+作成して書き込みます。完了後に COSMOS_CATALOG_CONTAINER_NAME などを切り替えてください。
+concierge-agent ディレクトリで実行します:
+
+    python -m utils.reembed_catalog --target room_types_512 --dimensions 512 --index-type diskANN
+"""
+import argparse
+import asyncio
+import os
+from azure.cosmos.aio import CosmosClient
+from dotenv import load_dotenv
+
+from utils.client_pool import catalog_container_name, close_async_clients
+from utils.embeddings import embed_texts, quantize_int8
+from utils.seed_cosmosdb import get_or_create_containers
+
+load_dotenv()
+
+
+async def reembed(args):
+    cosmos_client = CosmosClient(os.getenv("COSMOS_ENDPOINT"), os.getenv("COSMOS_KEY"))
+    try:
+        database = cosmos_client.get_database_client(os.getenv("COSMOS_DB_NAME"))
+        source = database.get_container_client(args.source)
+        docs = [doc async for doc in source.query_items(query="SELECT c.id, c.roomType, c.description FROM c")]
+        print(f"{args.source} から {len(docs)} 件の客室タイプを読み込みました。")
+
+        _, target = await get_or_create_containers(
+            cosmos_client, catalog=args.target, dimensions=args.dimensions,
+            data_type=args.data_type, index_type=args.index_type,
+        )
+        vectors = await embed_texts([doc["description"] for doc in docs], dimensions=args.dimensions)
+        for doc, vector in zip(docs, vectors):
+            await target.upsert_item({
+                **doc,
+                "vectorDescription": quantize_int8(vector) if args.data_type == "int8" else vector,
+            })
+
+        print(f"{len(docs)} 件を {args.target} に書き込みました。次の設定で新しいカタログに切り替えてください:")
+        print(f"  COSMOS_CATALOG_CONTAINER_NAME={args.target}")
+        print(f"  AZURE_OPENAI_EMBEDDINGS_DIMENSIONS={args.dimensions}")
+        print(f"  VECTOR_DATA_TYPE={args.data_type}")
+        print(f"  VECTOR_INDEX_TYPE={args.index_type}")
+    finally:
+        await cosmos_client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="客室タイプのカタログを新しいベクトル表現で埋め込み直します。")
+    parser.add_argument("--source", default=catalog_container_name(), help="読み込むカタログコンテナー")
+    parser.add_argument("--target", required=True, help="書き込むカタログコンテナー（存在しない場合は作成）")
+    parser.add_argument("--dimensions", type=int, required=True, help="埋め込みの次元数")
+    parser.add_argument("--data-type", choices=["float32", "int8"], default="float32")
+    parser.add_argument("--index-type", choices=["flat", "quantizedFlat", "diskANN"], default="quantizedFlat")
+    args = parser.parse_args()
+
+    if args.target == args.source:
+        parser.error("ベクトルポリシーは変更できないため、--target には別のコンテナーを指定してください。")
+
+    try:
+        await reembed(args)
+    finally:
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,308 @@
+"""客室在庫ストアのローカル実装。
+
+客室タイプのカタログ（説明文と埋め込みを 1 タイプにつき 1 件）と、日付ごとの軽量な在庫
+（roomType, date, available, price）を分けて保持します。プラグインは次のインターフェースを
+持つストアを通じてアクセスします（AsyncCosmosDBClient も同じインターフェースを実装しています）:
+
+- get_room_availability(room_type, date)
+- get_availability_range(room_types, date_from, date_to)
+- update_room_count(room_type, date, count)
+- upsert_room_type(room_type, description, vector=None)
+- insert_room_record(room_type, date, available, price, description=None, vector=None)
+- search_room_types(embedding, top_n)
+- join_inventory(room_types, top_k, date_from=None, date_to=None, min_available=0, max_price=None)
+- search_rooms(embedding, top_k, date_from=None, date_to=None, min_available=0, max_price=None)
+
+ROOM_STORE 環境変数で cosmos（既定）/ memory / sqlite を選択します。
+ローカル実装はネットワークなしで動作するため、CI での負荷試験や小規模な単一施設での運用に使えます。
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import Optional
+
+import numpy as np
+
+from utils.embeddings import embed_document
+
+SEARCH_FIELDS = ("roomType", "description", "price", "available", "date")
+
+# カタログ検索で候補にする客室タイプ数（絞り込みで除外される分を見込んで top_k より多く取る）
+CATALOG_SEARCH_CANDIDATES = int(os.getenv("CATALOG_SEARCH_CANDIDATES", "20"))
+
+
+def price_amount(price) -> Optional[float]:
+    """"$250" のような料金表記から数値を取り出します。"""
+    if isinstance(price, (int, float)):
+        return float(price)
+    try:
+        return float(re.sub(r"[^\d.]", "", price or ""))
+    except ValueError:
+        return None
+
+
+def inventory_doc(room_type: str, date: str, available: int, price: str) -> dict:
+    """日付ごとの在庫ドキュメント。説明文と埋め込みはカタログ側に 1 件だけ保持します。"""
+    return {
+        "id": f"{room_type}_{date}",
+        "roomType": room_type,
+        "date": date,
+        "available": available,
+        "price": price,
+        "priceAmount": price_amount(price),
+    }
+
+
+def matches_filters(doc: dict, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                    min_available: int = 0, max_price: Optional[float] = None) -> bool:
+    """search_rooms の絞り込み条件（日付範囲・最小空室数・料金上限）を満たすかどうかを返します。"""
+    if date_from and doc["date"] < date_from:
+        return False
+    if date_to and doc["date"] > date_to:
+        return False
+    if doc["available"] < min_available:
+        return False
+    if max_price is not None:
+        amount = doc.get("priceAmount")
+        if amount is None:
+            amount = price_amount(doc["price"])
+        if amount is None or amount > max_price:
+            return False
+    return True
+
+
+def _top_k(matrix: np.ndarray, embedding: list[float], top_k: int) -> list[int]:
+    """正規化済みの行列に対するコサイン類似度の上位 top_k 件の行番号を返します。"""
+    if matrix.shape[0] == 0 or top_k <= 0:
+        return []
+    query = np.asarray(embedding, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+    scores = matrix @ query
+    top_k = min(top_k, scores.shape[0])
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])].tolist()
+
+
+def _normalize_rows(vectors: list) -> np.ndarray:
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _join_result(room_type: dict, inventory: dict) -> dict:
+    return {
+        "roomType": room_type["roomType"],
+        "description": room_type["description"],
+        "price": inventory["price"],
+        "available": inventory["available"],
+        "date": inventory["date"],
+    }
+
+
+class CatalogSearchMixin:
+    """カタログのベクトル検索と在庫の結合で search_rooms を実装します。
+
+    結果は類似度の高い客室タイプ順に、条件を満たす最も早い日付の在庫を 1 タイプ 1 件ずつ返します。
+    """
+
+    async def search_rooms(self, embedding: list[float], top_k: int = 3, **filters):
+        room_types = await self.search_room_types(embedding, max(top_k, CATALOG_SEARCH_CANDIDATES))
+        return await self.join_inventory(room_types, top_k, **filters)
+
+
+class InMemoryRoomStore(CatalogSearchMixin):
+    """プロセス内の辞書に在庫を保持するストア。"""
+
+    def __init__(self):
+        self._room_types = {}
+        self._vectors = {}
+        self._inventory = {}
+        self._names = []
+        self._matrix = None
+
+    async def get_room_availability(self, room_type: str, date: str):
+        doc = self._inventory.get(room_type, {}).get(date)
+        return dict(doc) if doc else None
+
+    async def get_availability_range(self, room_types: list[str], date_from: str, date_to: str):
+        return [
+            dict(doc)
+            for room_type in room_types
+            for doc in self._inventory.get(room_type, {}).values()
+            if date_from <= doc["date"] <= date_to
+        ]
+
+    async def update_room_count(self, room_type: str, date: str, count: int):
+        if count < 1:
+            raise ValueError(f"予約する客室数は 1 以上で指定してください: {count}")
+        doc = self._inventory.get(room_type, {}).get(date)
+        if not doc or doc["available"] < count:
+            return None
+        doc["available"] -= count
+        return dict(doc)
+
+    async def upsert_room_type(self, room_type: str, description: str, vector: Optional[list[float]] = None):
+        if vector is None:
+            vector = await embed_document(description)
+        self._room_types[room_type] = {"roomType": room_type, "description": description}
+        self._vectors[room_type] = vector
+        self._matrix = None
+
+    async def insert_room_record(self, room_type: str, date: str, available: int, price: str,
+                                 description: Optional[str] = None, vector: Optional[list[float]] = None):
+        current = self._room_types.get(room_type)
+        if description is not None and (current is None or current["description"] != description):
+            await self.upsert_room_type(room_type, description, vector)
+        self._inventory.setdefault(room_type, {})[date] = inventory_doc(room_type, date, available, price)
+
+    async def search_room_types(self, embedding: list[float], top_n: int):
+        if self._matrix is None:
+            self._names = list(self._vectors)
+            self._matrix = _normalize_rows([self._vectors[name] for name in self._names])
+        return [dict(self._room_types[self._names[row]]) for row in _top_k(self._matrix, embedding, top_n)]
+
+    async def join_inventory(self, room_types: list[dict], top_k: int, **filters):
+        results = []
+        for room_type in room_types:
+            matching = [
+                doc for doc in self._inventory.get(room_type["roomType"], {}).values()
+                if matches_filters(doc, **filters)
+            ]
+            if matching:
+                results.append(_join_result(room_type, min(matching, key=lambda doc: doc["date"])))
+                if len(results) == top_k:
+                    break
+        return results
+
+
+class SQLiteRoomStore(CatalogSearchMixin):
+    """SQLite ファイル（または :memory:）に在庫を保持するストア。"""
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._names = None
+        self._matrix = None
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS room_types (
+                    roomType TEXT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    vectorDescription BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS inventory (
+                    id TEXT PRIMARY KEY,
+                    roomType TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    available INTEGER NOT NULL,
+                    price TEXT NOT NULL,
+                    priceAmount REAL
+                );
+                CREATE INDEX IF NOT EXISTS inventory_room_type_date ON inventory (roomType, date);
+                """
+            )
+
+    def _select(self, doc_id: str):
+        row = self._conn.execute(
+            "SELECT id, roomType, date, available, price, priceAmount FROM inventory WHERE id = ?",
+            (doc_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    async def get_room_availability(self, room_type: str, date: str):
+        with self._lock:
+            return self._select(f"{room_type}_{date}")
+
+    async def get_availability_range(self, room_types: list[str], date_from: str, date_to: str):
+        placeholders = ", ".join("?" for _ in room_types)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT roomType, date, available, price FROM inventory "
+                f"WHERE roomType IN ({placeholders}) AND date >= ? AND date <= ? ORDER BY roomType, date",
+                [*room_types, date_from, date_to],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    async def update_room_count(self, room_type: str, date: str, count: int):
+        if count < 1:
+            raise ValueError(f"予約する客室数は 1 以上で指定してください: {count}")
+        doc_id = f"{room_type}_{date}"
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE inventory SET available = available - ? WHERE id = ? AND available >= ?",
+                (count, doc_id, count),
+            )
+            return self._select(doc_id) if cursor.rowcount else None
+
+    async def upsert_room_type(self, room_type: str, description: str, vector: Optional[list[float]] = None):
+        if vector is None:
+            vector = await embed_document(description)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO room_types (roomType, description, vectorDescription) VALUES (?, ?, ?)",
+                (room_type, description, np.asarray(vector, dtype=np.float32).tobytes()),
+            )
+            self._matrix = None
+
+    async def insert_room_record(self, room_type: str, date: str, available: int, price: str,
+                                 description: Optional[str] = None, vector: Optional[list[float]] = None):
+        if description is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT description FROM room_types WHERE roomType = ?", (room_type,)
+                ).fetchone()
+            if row is None or row["description"] != description:
+                await self.upsert_room_type(room_type, description, vector)
+        doc = inventory_doc(room_type, date, available, price)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO inventory (id, roomType, date, available, price, priceAmount) "
+                "VALUES (:id, :roomType, :date, :available, :price, :priceAmount)",
+                doc,
+            )
+
+    async def search_room_types(self, embedding: list[float], top_n: int):
+        with self._lock:
+            if self._matrix is None:
+                rows = self._conn.execute("SELECT roomType, description, vectorDescription FROM room_types").fetchall()
+                self._names = [(row["roomType"], row["description"]) for row in rows]
+                self._matrix = _normalize_rows(
+                    [np.frombuffer(row["vectorDescription"], dtype=np.float32) for row in rows]
+                )
+            return [
+                {"roomType": self._names[row][0], "description": self._names[row][1]}
+                for row in _top_k(self._matrix, embedding, top_n)
+            ]
+
+    async def join_inventory(self, room_types: list[dict], top_k: int, date_from: Optional[str] = None,
+                             date_to: Optional[str] = None, min_available: int = 0, max_price: Optional[float] = None):
+        clauses, params = ["roomType = ?", "available >= ?"], [min_available]
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        if max_price is not None:
+            clauses.append("priceAmount <= ?")
+            params.append(max_price)
+        query = (
+            "SELECT date, available, price FROM inventory "
+            f"WHERE {' AND '.join(clauses)} ORDER BY date LIMIT 1"
+        )
+
+        results = []
+        with self._lock:
+            for room_type in room_types:
+                row = self._conn.execute(query, [room_type["roomType"], *params]).fetchone()
+                if row:
+                    results.append(_join_result(room_type, dict(row)))
+                    if len(results) == top_k:
+                        break
+        return results
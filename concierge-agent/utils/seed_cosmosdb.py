@@ -1,54 +1,93 @@
-import os
-import random
+"""客室在庫のシード（一括投入）スクリプト。
+
+concierge-agent ディレクトリで実行します:
+
+    python -m utils.seed_cosmosdb --start-date 2025-04-12 --days 365
+
+- 説明文と埋め込みは客室タイプのカタログコンテナーに 1 タイプ 1 件だけ書き込み、
+  日付ごとの在庫ドキュメントは roomType / date / available / price だけを持ちます
+- 同一の説明文は 1 回だけ、複数入力をまとめた埋め込みリクエストで変換します
+- id は {roomType}_{date} の決定的な値で、upsert するため再実行しても重複しません
+- 書き込みは --concurrency 件までの並列で行い、完了した id をチェックポイントファイルに
+  記録するため、失敗後に再実行すると未完了のレコードだけを投入します。チェックポイントには
+  投入先（ストア・エンドポイント・データベース・コンテナー）と日付範囲を記録し、異なる投入先や
+  日付範囲では使いません（ROOM_STORE=memory ではチェックポイントを使いません）
+
+ROOM_STORE=memory/sqlite を指定すると、Cosmos DB の代わりにローカルストアに投入します。
+"""
+import argparse
+import asyncio
 import json
-from azure.cosmos import CosmosClient, PartitionKey, exceptions
-from openai import AzureOpenAI
+import os
+from datetime import date, timedelta
+from typing import Optional
+from azure.core.exceptions import AzureError
+from azure.cosmos import PartitionKey, exceptions
+from azure.cosmos.aio import CosmosClient
 from dotenv import load_dotenv
 
+from utils.client_pool import catalog_container_name, close_async_clients, get_room_store
+from utils.cosmosdb_client_aio import AsyncCosmosDBClient
+from utils.embeddings import embed_texts, embedding_dimensions
+
 # 環境変数をロード
 load_dotenv()
 
-# Azure OpenAI クライアントを初期化
-openai_client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
-def generate_embeddings(text):
-    """Azure OpenAIを使用して指定されたテキストの埋め込みを生成します。"""
-    response = openai_client.embeddings.create(
-        input=[text],
-        model=os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT")
-    )
-    return response.data[0].embedding
-
-# Cosmos DB クライアントを初期化
-cosmos_client = CosmosClient(os.getenv("COSMOS_ENDPOINT"), os.getenv("COSMOS_KEY"))
-
 # データベースとコンテナー名
 database_name = os.getenv("COSMOS_DB_NAME")
 container_name = os.getenv("COSMOS_CONTAINER_NAME")
+catalog_name = catalog_container_name()
 partition_key_path = "/roomType"
-vector_dimensions = 1536  # text-3-embedding-small 出力次元
+vector_dimensions = embedding_dimensions()  # text-3-embedding-small の既定は 1536
+vector_data_type = os.getenv("VECTOR_DATA_TYPE", "float32")  # float32 / int8
+vector_index_type = os.getenv("VECTOR_INDEX_TYPE", "quantizedFlat")  # flat / quantizedFlat / diskANN
+# チェックポイントの 1 行目に投入先と日付範囲を JSON で記録する
+CHECKPOINT_HEADER = "# target: "
 
-# データベースを作成（または取得）
-database = cosmos_client.create_database_if_not_exists(database_name)
 
-# ベクトル埋め込みポリシーを定義
-vector_embedding_policy = {
-    "vectorEmbeddings": [
-        {
-            "path": "/vectorDescription",
-            "dataType": "float32",
-            "dimensions": vector_dimensions,
-            "distanceFunction": "cosine"
-        }
-    ]
-}
+def build_vector_embedding_policy(dimensions: int, data_type: str = "float32"):
+    """ベクトル埋め込みポリシーを生成します。"""
+    return {
+        "vectorEmbeddings": [
+            {
+                "path": "/vectorDescription",
+                "dataType": data_type,
+                "dimensions": dimensions,
+                "distanceFunction": "cosine"
+            }
+        ]
+    }
+
+
+def build_indexing_policy(index_type: str = "quantizedFlat"):
+    """カタログコンテナーのインデックスポリシーを生成します。"""
+    if index_type not in ("flat", "quantizedFlat", "diskANN"):
+        raise ValueError(f"不明なベクトルインデックスの種類です: {index_type}")
+    return {
+        "includedPaths": [
+            {
+                "path": "/*"
+            }
+        ],
+        "excludedPaths": [
+            {
+                "path": "/\"_etag\"/?"
+            },
+            {
+                "path": "/vectorDescription/*"
+            }
+        ],
+        "vectorIndexes": [
+            {
+                "path": "/vectorDescription",
+                "type": index_type
+            }
+        ]
+    }
 
-# インデックスポリシーを定義
-indexing_policy = {
+
+# 在庫コンテナーのインデックスポリシーを定義（ベクトルは持たない）
+inventory_indexing_policy = {
     "includedPaths": [
         {
             "path": "/*"
@@ -56,123 +95,231 @@ indexing_policy = {
     ],
     "excludedPaths": [
         {
-            "path": "/\"_etag\"/?",
-            "path": "/vectorDescription/*"
-        }
-    ],
-    "vectorIndexes": [
-        {
-            "path": "/vectorDescription",
-            "type": "quantizedFlat"
+            "path": "/\"_etag\"/?"
         }
     ]
 }
 
-
-# 指定されたポリシーでコンテナーを作成（または取得）
-try:
-    container = database.create_container(
-        id=container_name,
-        partition_key=PartitionKey(path=partition_key_path),
-        indexing_policy=indexing_policy,
-        vector_embedding_policy=vector_embedding_policy,
-    )
-    print(f"コンテナー '{container_name}' が正常に作成されました。")
-except exceptions.CosmosResourceExistsError:
-    container = database.get_container_client(container_name)
-    print(f"コンテナー '{container_name}' は既に存在します。")
-
-# 挿入する客室レコード
+# 客室タイプのカタログ（日付ごとの在庫レコードはここから生成）
 rooms = [
     {
         "roomType": "suite",
-        "date": "2025-04-12",
         "available": 2,
         "price": "$250",
         "description": "キングサイズベッド、オーシャンビュー、エレガントな装飾を備えた広々とした豪華なスイートルーム。ロマンチックな休暇に最適です。"
     },
     {
         "roomType": "double",
-        "date": "2025-04-12",
         "available": 4,
         "price": "$150",
         "description": "モダンなデザインのデスクスペース付きの快適なダブルルーム。ビジネス旅行者やファミリーに理想的です。"
     },
     {
         "roomType": "single",
-        "date": "2025-04-12",
         "available": 5,
         "price": "$120",
         "description": "一人旅に最適な居心地の良いシングルルーム。読書コーナー、コンパクトなワークスペース、中庭の眺めが含まれます。"
     },
     {
         "roomType": "loft",
-        "date": "2025-04-12",
         "available": 3,
         "price": "$300",
         "description": "インダストリアルな雰囲気、むき出しのレンガ、フルキッチンを備えたスタイリッシュなオープンプランロフト。クリエイティブな隠れ家に最適です。"
     },
     {
         "roomType": "penthouse",
-        "date": "2025-04-12",
         "available": 1,
         "price": "$500",
         "description": "スカイラインビュー、プライベートバルコニー、ジャグジー、VIPアメニティ付きのプレミアムペントハウススイート。"
     },
     {
         "roomType": "family",
-        "date": "2025-04-12",
         "available": 3,
         "price": "$200",
         "description": "クイーンベッド2台、子供向けの装飾、小さなプレイエリアを備えた大きなファミリースイート。"
     },
     {
         "roomType": "garden",
-        "date": "2025-04-12",
         "available": 2,
         "price": "$180",
         "description": "パティオアクセス、自然光、読書やヨガに最適なリラックスした雰囲気の静かなガーデンビュールーム。"
     },
     {
         "roomType": "executive",
-        "date": "2025-04-12",
         "available": 2,
         "price": "$220",
         "description": "プライベートオフィススペース、人間工学に基づいた椅子、エスプレッソマシン、通話用防音設備を備えたエグゼクティブスイート。"
     },
     {
         "roomType": "accessible",
-        "date": "2025-04-12",
         "available": 2,
         "price": "$140",
         "description": "ウォークインシャワー、手すり、移動のための追加フロアスペースを備えた車椅子対応ルーム。"
     },
     {
         "roomType": "eco",
-        "date": "2025-04-12",
         "available": 2,
         "price": "$160",
         "description": "リサイクル素材、ゼロウェイストアメニティ、緑の屋上庭園の眺めを備えたエコフレンドリールーム。"
     }
 ]
 
-# ベクトル埋め込みを含む客室レコードを挿入
-for room in rooms:
-    room_id = f"{room['roomType']}_{random.randint(1, 1000)}"
-    vector_description = generate_embeddings(room["description"])
-    room_record = {
-        "id": room_id,
-        "roomType": room["roomType"],
-        "date": room["date"],
-        "available": room["available"],
-        "price": room["price"],
-        "description": room["description"],
-        "vectorDescription": vector_description
-    }
+
+async def _get_or_create_container(database, name, **policies):
     try:
-        container.create_item(body=room_record)
-        print(f"客室レコードを挿入しました: {room_id}")
-    except exceptions.CosmosHttpResponseError as e:
-        print(f"客室レコード {room_id} の挿入に失敗しました: {e.message}")
+        container = await database.create_container(
+            id=name,
+            partition_key=PartitionKey(path=partition_key_path),
+            **policies,
+        )
+        print(f"コンテナー '{name}' が正常に作成されました。")
+    except exceptions.CosmosResourceExistsError:
+        container = database.get_container_client(name)
+        print(f"コンテナー '{name}' は既に存在します。")
+    return container
+
+
+async def get_or_create_containers(cosmos_client, catalog=None, dimensions=None, data_type=None, index_type=None):
+    """在庫コンテナーと、ベクトルポリシー付きのカタログコンテナーを作成（または取得）します。
+
+    省略した引数は環境変数（AZURE_OPENAI_EMBEDDINGS_DIMENSIONS / VECTOR_DATA_TYPE / VECTOR_INDEX_TYPE）の値を使います。
+    既存のコンテナーのベクトルポリシーは変更されません。
+    """
+    database = await cosmos_client.create_database_if_not_exists(database_name)
+    container = await _get_or_create_container(database, container_name, indexing_policy=inventory_indexing_policy)
+    catalog = await _get_or_create_container(
+        database,
+        catalog or catalog_name,
+        indexing_policy=build_indexing_policy(index_type or vector_index_type),
+        vector_embedding_policy=build_vector_embedding_policy(
+            dimensions or vector_dimensions, data_type or vector_data_type
+        ),
+    )
+    return container, catalog
+
+
+def inventory_records(start_date: date, days: int):
+    """カタログの各客室タイプについて、start_date から days 日分の在庫レコードを生成します。"""
+    for offset in range(days):
+        day = (start_date + timedelta(days=offset)).isoformat()
+        for room in rooms:
+            yield {"id": f"{room['roomType']}_{day}", "roomType": room["roomType"], "date": day,
+                   "available": room["available"], "price": room["price"]}
+
+
+def checkpoint_target(args) -> Optional[dict]:
+    """チェックポイントが対象とする投入先と日付範囲。ROOM_STORE=memory は永続化されないため None を返します。"""
+    backend = os.getenv("ROOM_STORE", "cosmos")
+    if backend == "memory":
+        return None
+    target = {"store": backend, "start_date": args.start_date.isoformat(), "days": args.days}
+    if backend == "cosmos":
+        target.update(endpoint=os.getenv("COSMOS_ENDPOINT"), database=database_name,
+                      container=container_name, catalog=catalog_name)
+    else:
+        target["path"] = os.path.abspath(os.getenv("ROOM_STORE_SQLITE_PATH", "rooms.sqlite3"))
+    return target
+
+
+def load_checkpoint(path: str, target: dict) -> set:
+    """チェックポイントの投入済み id を返します。
+
+    1 行目のヘッダーに記録した投入先・日付範囲が target と異なる場合は ValueError を送出します。
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as file:
+        header = file.readline()
+        if not header.startswith(CHECKPOINT_HEADER) or json.loads(header[len(CHECKPOINT_HEADER):]) != target:
+            raise ValueError(
+                f"チェックポイント {path} は別の投入先または日付範囲のものです。"
+                "--reset で最初から投入するか、--checkpoint で別のファイルを指定してください。"
+            )
+        return {line.strip() for line in file if line.strip()}
+
+
+async def seed(args):
+    target = checkpoint_target(args)
+    done = set() if args.reset or target is None else load_checkpoint(args.checkpoint, target)
+    records = [record for record in inventory_records(args.start_date, args.days) if record["id"] not in done]
+    print(f"投入対象: {len(records)} 件（チェックポイント済み: {len(done)} 件）")
+    if not records:
+        return 0
+
+    cosmos_client = None
+    if target is not None and target["store"] == "cosmos":
+        cosmos_client = CosmosClient(os.getenv("COSMOS_ENDPOINT"), os.getenv("COSMOS_KEY"))
+    try:
+        if cosmos_client is not None:
+            store = AsyncCosmosDBClient(*await get_or_create_containers(cosmos_client))
+        else:
+            store = get_room_store()
+
+        # 同一の説明文は 1 回だけ埋め込み、カタログに 1 タイプ 1 件で書き込む
+        descriptions = list(dict.fromkeys(room["description"] for room in rooms))
+        vectors = dict(zip(descriptions, await embed_texts(descriptions, batch_size=args.batch_size)))
+        for room in rooms:
+            await store.upsert_room_type(room["roomType"], room["description"], vector=vectors[room["description"]])
+        print(f"{len(rooms)} 件の客室タイプをカタログに登録しました（ユニークな説明文: {len(descriptions)} 件）。")
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        failures = 0
+        # メモリーストアはプロセス終了で失われるため、チェックポイントに記録しない
+        checkpoint = None
+        if target is not None:
+            fresh = args.reset or not os.path.exists(args.checkpoint)
+            checkpoint = open(args.checkpoint, "w" if fresh else "a", encoding="utf-8")
+            if fresh:
+                checkpoint.write(CHECKPOINT_HEADER + json.dumps(target, ensure_ascii=False, sort_keys=True) + "\n")
+
+        async def write(record):
+            nonlocal failures
+            async with semaphore:
+                try:
+                    await store.insert_room_record(
+                        record["roomType"], record["date"], record["available"], record["price"]
+                    )
+                except AzureError as e:
+                    failures += 1
+                    print(f"客室レコード {record['id']} の挿入に失敗しました: {e.message}")
+                    return
+            if checkpoint is not None:
+                checkpoint.write(record["id"] + "\n")
+                checkpoint.flush()
+
+        try:
+            await asyncio.gather(*(write(record) for record in records))
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+    finally:
+        if cosmos_client is not None:
+            await cosmos_client.close()
+
+    print(f"{len(records) - failures} 件の客室レコードを投入しました（失敗: {failures} 件）。")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="客室在庫レコードを一括投入します。")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2025, 4, 12), help="在庫の開始日 (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=1, help="投入する日数")
+    parser.add_argument("--batch-size", type=int, default=16, help="1 回の埋め込みリクエストにまとめる説明文の数")
+    parser.add_argument("--concurrency", type=int, default=32, help="同時書き込み数の上限")
+    parser.add_argument("--checkpoint", default=".seed_checkpoint", help="投入済み id を記録するファイル")
+    parser.add_argument("--reset", action="store_true", help="チェックポイントを無視して最初から投入する")
+    args = parser.parse_args()
+
+    try:
+        failures = await seed(args)
+    finally:
+        await close_async_clients()
+
+    if failures:
+        print("一部のレコードが失敗しました。再実行すると未完了のレコードから再開します。")
+    else:
+        print("すべての客室レコードが処理されました。")
+
 
-print("すべての客室レコードが処理されました。")
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,225 @@
+"""ツール呼び出しのトレース。
+
+Semantic Kernel の自動関数呼び出しフィルターで、各ツール呼び出しの開始・終了時刻、引数と結果のサイズ、
+エラーを call_id ごとに記録します。同じツールが並列に呼び出されても計測が混ざりません。
+記録したスパンはツールごとのレイテンシ（p50 / p95 / p99）に集計し、JSONL ファイルや
+OpenTelemetry に出力できます。
+
+    TOOL_TRACE_FILE=tool_traces.jsonl   # JSONL に出力
+    TOOL_TRACE_OTEL=true                # OpenTelemetry のスパンとして出力
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from utils.latency import latency_summary
+
+# Kernel はツールの例外を捕捉し、このメッセージを結果として返します
+FUNCTION_ERROR_PREFIX = "An error occurred while invoking the function"
+
+
+def call_key(content) -> str:
+    """FunctionCallContent / FunctionResultContent に共通する呼び出し ID を返します。"""
+    return content.call_id or content.id
+
+
+def _size(value) -> int:
+    if value is None:
+        return 0
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return len(value.encode("utf-8"))
+
+
+@dataclass
+class ToolSpan:
+    """ツール呼び出し 1 件のスパン。
+
+    start / end は time.perf_counter() の値で、所要時間の計算にだけ使います（壁時計の調整の影響を受けない）。
+    出力する時刻は開始時の壁時計 started_at（UNIX 時刻、秒）です。
+    """
+    call_id: str
+    name: str
+    start: float
+    started_at: float
+    end: Optional[float] = None
+    arguments_bytes: int = 0
+    result_bytes: int = 0
+    error: Optional[str] = None
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return self.end - self.start if self.end is not None else None
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        del record["start"], record["end"]  # 単調時計の値はプロセスの外では意味を持たない
+        return {**record, "duration": self.duration}
+
+
+class JsonlSpanExporter:
+    """終了したスパンを 1 行 1 件の JSON として追記します。"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: ToolSpan):
+        line = json.dumps(span.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class OpenTelemetrySpanExporter:
+    """スパンを OpenTelemetry のトレーサープロバイダーに送ります。
+
+    プロバイダーが未設定で OTEL_EXPORTER_OTLP_ENDPOINT が指定されている場合は、OTLP/HTTP で送信するよう設定します。
+    """
+
+    def __init__(self, service_name: str = "concierge-agent"):
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.trace import Status, StatusCode
+
+        if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") and not isinstance(trace.get_tracer_provider(), TracerProvider):
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+
+        self._trace = trace
+        self._tracer = trace.get_tracer(service_name)
+        self._error_status = lambda message: Status(StatusCode.ERROR, message)
+
+    def export(self, span: ToolSpan):
+        otel_span = self._tracer.start_span(
+            f"tool {span.name}",
+            start_time=int(span.started_at * 1e9),
+            attributes={
+                "tool.call_id": span.call_id,
+                "tool.name": span.name,
+                "tool.arguments_bytes": span.arguments_bytes,
+                "tool.result_bytes": span.result_bytes,
+                **{f"tool.{key}": value for key, value in span.attributes.items()},
+            },
+        )
+        if span.error:
+            otel_span.set_status(self._error_status(span.error))
+        otel_span.end(end_time=int((span.started_at + span.duration) * 1e9))
+
+    def close(self):
+        provider = self._trace.get_tracer_provider()
+        if hasattr(provider, "force_flush"):
+            provider.force_flush()
+
+
+class ToolTracer:
+    """call_id をキーにツール呼び出しを記録し、ツールごとのレイテンシを集計します。"""
+
+    def __init__(self, exporters: Optional[list] = None, window: int = 1000, keep_spans: int = 1000):
+        self.exporters = exporters or []
+        self._open: dict[str, ToolSpan] = {}
+        self._finished: OrderedDict[str, ToolSpan] = OrderedDict()
+        self._keep_spans = keep_spans
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def register(self, kernel):
+        """カーネルの自動関数呼び出しフィルターとして登録します。"""
+        from semantic_kernel.filters import FilterTypes
+        kernel.add_filter(FilterTypes.AUTO_FUNCTION_INVOCATION, self.auto_function_invocation_filter)
+
+    async def auto_function_invocation_filter(self, context, next):
+        call = context.function_call_content
+        call_id = (call_key(call) if call else None) or uuid.uuid4().hex
+        name = call.name if call else context.function.fully_qualified_name
+        self.start(call_id, name, call.arguments if call else None)
+        error = None
+        try:
+            await next(context)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            result = context.function_result.value if context.function_result else None
+            if error is None and isinstance(result, str) and result.startswith(FUNCTION_ERROR_PREFIX):
+                error = result
+            self.finish(call_id, result, error)
+
+    def start(self, call_id: str, name: str, arguments=None, **attributes) -> ToolSpan:
+        span = ToolSpan(call_id=call_id, name=name, start=time.perf_counter(), started_at=time.time(),
+                        arguments_bytes=_size(arguments), attributes=attributes)
+        with self._lock:
+            self._open[call_id] = span
+        return span
+
+    def finish(self, call_id: str, result=None, error: Optional[str] = None) -> Optional[ToolSpan]:
+        with self._lock:
+            span = self._open.pop(call_id, None)
+            if span is None:
+                return None
+            span.end = time.perf_counter()
+            span.result_bytes = _size(result)
+            span.error = error
+            self._finished[call_id] = span
+            while len(self._finished) > self._keep_spans:
+                self._finished.popitem(last=False)
+            self._durations[span.name].append(span.duration)
+            if error:
+                self._errors[span.name] += 1
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"ツールトレースの出力に失敗しました: {e}")
+        return span
+
+    def get(self, call_id: str) -> Optional[ToolSpan]:
+        with self._lock:
+            return self._finished.get(call_id) or self._open.get(call_id)
+
+    def summary(self) -> dict:
+        """ツールごとの呼び出し数・エラー数・レイテンシのパーセンタイル（秒）。"""
+        with self._lock:
+            return {
+                name: {**latency_summary(durations), "errors": self._errors[name]}
+                for name, durations in self._durations.items()
+            }
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"{'ツール':<44} {'回数':>5} {'エラー':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for name, stats in sorted(summary.items()):
+            print(f"{name:<44} {stats['count']:>5} {stats['errors']:>5} "
+                  f"{stats['p50']:>7.3f}s {stats['p95']:>7.3f}s {stats['p99']:>7.3f}s")
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+
+def tracer_from_env() -> ToolTracer:
+    """TOOL_TRACE_FILE / TOOL_TRACE_OTEL の設定に従ってエクスポーターを構成したトレーサーを返します。"""
+    exporters = []
+    if os.getenv("TOOL_TRACE_FILE"):
+        exporters.append(JsonlSpanExporter(os.getenv("TOOL_TRACE_FILE")))
+    if os.getenv("TOOL_TRACE_OTEL", "false").lower() == "true":
+        exporters.append(OpenTelemetrySpanExporter())
+    return ToolTracer(exporters)
@@ -0,0 +1,188 @@
+"""客室検索用のプロセス内ベクトルインデックス。
+
+Cosmos DB を正とし、客室タイプのカタログから読み込んだ埋め込みを連続した float32 行列
+（または行ごとにスケールを持つ int8 行列）に保持して、NumPy のコサイン類似度で top-k を求めます。
+VECTOR_SEARCH_BACKEND=local を指定すると client_pool が在庫ストアをこのインデックスでラップします。
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from utils.room_store import CatalogSearchMixin
+
+
+class VectorIndex:
+    # int8 行列を一度に float32 へ変換しないよう、スコアはこの行数ずつ計算する
+    chunk_rows = 4096
+
+    def __init__(self, quantization: str = "none", fields: tuple = ("roomType", "description")):
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"不明な量子化方式です: {quantization}")
+        self.quantization = quantization
+        self.fields = fields
+        self.docs = []
+        self._rows = {}
+        self._matrix = None
+        self._scales = None
+        self._ids = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, dimensions: int, rows: int):
+        dtype = np.int8 if self.quantization == "int8" else np.float32
+        if self._matrix is None:
+            self._matrix = np.zeros((max(rows, 64), dimensions), dtype=dtype)
+            self._scales = np.ones(self._matrix.shape[0], dtype=np.float32)
+        elif rows > self._matrix.shape[0]:
+            # 追加のたびに再確保しないよう容量を倍々で増やす
+            capacity = max(rows, self._matrix.shape[0] * 2)
+            matrix = np.zeros((capacity, dimensions), dtype=dtype)
+            matrix[:self._size] = self._matrix[:self._size]
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._matrix, self._scales = matrix, scales
+
+    def upsert(self, docs: list[dict]):
+        """vectorDescription を含むドキュメントを追加または更新します。"""
+        docs = [doc for doc in docs if doc.get("vectorDescription")]
+        if not docs:
+            return
+        vectors = np.asarray([doc["vectorDescription"] for doc in docs], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+
+        new_ids = [doc["id"] for doc in docs if doc["id"] not in self._rows]
+        self._reserve(vectors.shape[1], self._size + len(set(new_ids)))
+        for doc, vector in zip(docs, vectors):
+            row = self._rows.get(doc["id"])
+            if row is None:
+                row = self._rows[doc["id"]] = self._size
+                self.docs.append(None)
+                self._ids.append(doc["id"])
+                self._size += 1
+            self.docs[row] = {field: doc[field] for field in self.fields}
+            if self.quantization == "int8":
+                scale = float(np.abs(vector).max()) / 127 or 1.0
+                self._matrix[row] = np.round(vector / scale).astype(np.int8)
+                self._scales[row] = scale
+            else:
+                self._matrix[row] = vector
+
+    def remove(self, ids):
+        """指定した id のドキュメントを削除します。空いた行には末尾の行を移して行列を詰めます。"""
+        for doc_id in ids:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._scales[row] = self._scales[last]
+                self.docs[row] = self.docs[last]
+                self._ids[row] = self._ids[last]
+                self._rows[self._ids[row]] = row
+            self.docs.pop()
+            self._ids.pop()
+            self._size = last
+
+    def ids(self) -> set:
+        return set(self._rows)
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        if self.quantization != "int8":
+            return queries @ self._matrix[:self._size].T
+        # int8 の行をチャンクごとに掛けてから行ごとのスケールを掛ける（float32 の行列全体は作らない）
+        scores = np.empty((queries.shape[0], self._size), dtype=np.float32)
+        for start in range(0, self._size, self.chunk_rows):
+            end = min(start + self.chunk_rows, self._size)
+            scores[:, start:end] = queries @ self._matrix[start:end].T
+            scores[:, start:end] *= self._scales[start:end]
+        return scores
+
+    def search_many(self, embeddings: list[list[float]], top_k: int = 3, mask: np.ndarray = None) -> list[list[int]]:
+        """複数のクエリを 1 回の行列積でまとめて検索し、クエリごとの行番号を返します。
+
+        mask を渡した場合は True の行だけを候補にします。
+        """
+        if mask is not None:
+            top_k = min(top_k, int(mask.sum()))
+        if self._size == 0 or top_k <= 0:
+            return [[] for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries /= norms
+
+        scores = self._scores(queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        top_k = min(top_k, self._size)
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        ordered = np.take_along_axis(scores, candidates, axis=1).argsort(axis=1)[:, ::-1]
+        return np.take_along_axis(candidates, ordered, axis=1).tolist()
+
+    def search(self, embedding: list[float], top_k: int = 3) -> list[dict]:
+        return [dict(self.docs[row]) for row in self.search_many([embedding], top_k)[0]]
+
+
+class IndexedRoomStore(CatalogSearchMixin):
+    """在庫ストアをラップし、客室タイプのベクトル検索だけをローカルのインデックスで処理します。
+
+    インデックスは最初の検索時（または refresh 呼び出し時）にカタログコンテナーから読み込み、
+    以降は refresh_seconds ごとに _ts が前回の取り込み以降のドキュメントだけを差分で取り込み、
+    カタログの id の一覧と突き合わせて削除された客室タイプをインデックスから除きます。
+    在庫との結合や読み書きはラップしたストアに委譲します。
+    """
+
+    def __init__(self, store, quantization: str = "none", refresh_seconds: float = 60.0):
+        self.store = store
+        self.index = VectorIndex(quantization)
+        self.refresh_seconds = refresh_seconds
+        self._last_ts = 0
+        self._refreshed_at = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def refresh(self):
+        async with self._refresh_lock:
+            query = (
+                "SELECT c.id, c.roomType, c.description, c.vectorDescription, c._ts "
+                # _ts は秒単位のため、前回と同じ秒の書き込みも取り込めるよう >= で比較する（upsert は冪等）
+                "FROM c WHERE c._ts >= @since"
+            )
+            docs = [doc async for doc in self.store.catalog_container.query_items(
+                query=query, parameters=[{"name": "@since", "value": self._last_ts}]
+            )]
+            if self._refreshed_at is not None:
+                # 差分の問い合わせでは削除を検出できないため、id の一覧と突き合わせて消えた客室タイプを落とす
+                ids = {doc_id async for doc_id in self.store.catalog_container.query_items(
+                    query="SELECT VALUE c.id FROM c"
+                )}
+                self.index.remove(self.index.ids() - ids)
+            self.index.upsert(docs)
+            self._last_ts = max([self._last_ts] + [doc["_ts"] for doc in docs])
+            self._refreshed_at = time.monotonic()
+            return len(docs)
+
+    async def search_room_types(self, embedding: list[float], top_n: int):
+        if self._refreshed_at is None:
+            await self.refresh()
+        elif (time.monotonic() - self._refreshed_at > self.refresh_seconds and not self._refresh_lock.locked()
+              and (self._refresh_task is None or self._refresh_task.done())):
+            # 検索を待たせないよう差分の取り込みはバックグラウンドで行う
+            self._refreshed_at = time.monotonic()
+            self._refresh_task = asyncio.create_task(self.refresh())
+            self._refresh_task.add_done_callback(self._on_refresh_done)
+        return self.index.search(embedding, top_n)
+
+    @staticmethod
+    def _on_refresh_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"ベクトルインデックスの差分取り込みに失敗しました: {task.exception()}")
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)